@@ -22,10 +22,12 @@
 """
 
 import bpy
+import time
 from . import preferences
 from . import panels
 from . import operators
 from . import utils
+from . import preset_previews
 
 bl_info = {
     "name": "彩色连线",
@@ -40,15 +42,19 @@ bl_info = {
 }
 
 def register():
+    start_time = time.perf_counter()
     preferences.register()
+    preset_previews.register()
     panels.register()
     operators.register()
     utils.register()
+    utils.report_timing("注册插件", start_time)
     print("已注册")
 def unregister():
     utils.unregister()
     operators.unregister()
     panels.unregister()
+    preset_previews.unregister()
     preferences.unregister()
     print("已注销")
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+"""
+变化追踪
+
+为绘制流程维护一组版本号，任何输入变化时对应版本号加一，
+各级缓存（追踪结果、连线几何、GPU 批次、静态层）以版本号作为缓存键：
+
+    topology   连线/节点的增删改（depsgraph_update_post、节点/连线数量指纹）
+    layout     参与绘制的节点位置、尺寸、折叠状态（逐帧指纹）
+    selection  选中节点与活动节点（逐帧指纹）
+    view2d     视图平移/缩放和区域尺寸（逐帧指纹，按区域区分）
+    curving    主题中的连线弯曲度（msgbus + 逐帧指纹）
+    ui_scale   界面缩放（msgbus + 逐帧指纹）
+    settings   插件设置（逐帧指纹）
+    hover      悬停追踪时鼠标下的节点（由悬停操作符递增，不经过选择去抖）
+
+撤销/重做/加载文件后 RNA 指针可能失效，此时所有版本号递增并清空指纹。
+"""
+
+import bpy
+
+VERSION_NAMES = ('topology', 'layout', 'selection', 'view2d', 'curving', 'ui_scale', 'settings', 'hover')
+
+_versions = dict.fromkeys(VERSION_NAMES, 0)
+# (版本名, 作用域) -> 上次的指纹；作用域为节点树/区域指针，多个编辑器互不干扰
+_fingerprints = {}
+# msgbus 订阅的 owner
+_msgbus_owner = object()
+
+def bump(*names):
+    for name in names:
+        _versions[name] += 1
+
+def bump_all():
+    bump(*VERSION_NAMES)
+    _fingerprints.clear()
+
+def get_version(name):
+    return _versions[name]
+
+def get_versions(*names):
+    """按给定顺序返回版本号元组，可直接用作缓存键"""
+    return tuple(_versions[name] for name in names)
+
+def observe(name, scope, fingerprint):
+    """记录指纹，与上次不同（或首次出现）时递增版本号；返回当前版本号"""
+    key = (name, scope)
+    if key not in _fingerprints or _fingerprints[key] != fingerprint:
+        _versions[name] += 1
+        _fingerprints[key] = fingerprint
+    return _versions[name]
+
+def _node_layout_fingerprint(node):
+    location = tuple(node.location)
+    parent = node.parent
+    while parent is not None:
+        location += tuple(parent.location)
+        parent = parent.parent
+    return (node.as_pointer(), location, tuple(node.dimensions), node.hide)
+
+def observe_tree(tree):
+    """节点树拓扑的廉价指纹（连线的增删由 depsgraph 更新补充）"""
+    return observe('topology', tree.as_pointer(), (len(tree.nodes), len(tree.links)))
+
+def observe_selection(tree, selected_nodes, active_node):
+    fingerprint = (
+        active_node.as_pointer() if active_node else 0,
+        frozenset(node.as_pointer() for node in selected_nodes or ()),
+    )
+    return observe('selection', tree.as_pointer(), fingerprint)
+
+def layout_fingerprint(nodes):
+    """一组节点的布局指纹（位置含父级框架偏移、尺寸、折叠状态），可直接用作缓存键"""
+    return tuple(_node_layout_fingerprint(node) for node in nodes)
+
+def observe_layout(tree, nodes):
+    """只对参与绘制的节点计算布局指纹"""
+    fingerprint = frozenset(_node_layout_fingerprint(node) for node in nodes)
+    return observe('layout', tree.as_pointer(), fingerprint)
+
+def observe_view2d(region):
+    v2d = region.view2d
+    fingerprint = (
+        region.width, region.height,
+        v2d.region_to_view(0.0, 0.0), v2d.region_to_view(1000.0, 1000.0),
+    )
+    return observe('view2d', region.as_pointer(), fingerprint)
+
+# --- 事件来源 ---
+@bpy.app.handlers.persistent
+def _on_depsgraph_update_post(scene, depsgraph):
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.NodeTree):
+            bump('topology', 'layout')
+            return
+
+@bpy.app.handlers.persistent
+def _on_undo_redo(*args):
+    bump_all()
+
+@bpy.app.handlers.persistent
+def _on_load_post(*args):
+    bump_all()
+    # 加载文件会清除 msgbus 订阅
+    _subscribe_msgbus()
+
+def _subscribe_msgbus():
+    bpy.msgbus.clear_by_owner(_msgbus_owner)
+    subscriptions = (
+        ((bpy.types.PreferencesView, "ui_scale"), ('ui_scale',)),
+        ((bpy.types.ThemeNodeEditor, "noodle_curving"), ('curving',)),
+        ((bpy.types.SpaceNodeEditor, "node_tree"), ('topology', 'selection', 'layout')),
+    )
+    for key, names in subscriptions:
+        bpy.msgbus.subscribe_rna(
+            key=key,
+            owner=_msgbus_owner,
+            args=names,
+            notify=bump,
+        )
+
+_HANDLERS = (
+    (bpy.app.handlers.depsgraph_update_post, _on_depsgraph_update_post),
+    (bpy.app.handlers.undo_post, _on_undo_redo),
+    (bpy.app.handlers.redo_post, _on_undo_redo),
+    (bpy.app.handlers.load_post, _on_load_post),
+)
+
+def register():
+    for handler_list, handler in _HANDLERS:
+        if handler not in handler_list:
+            handler_list.append(handler)
+    _subscribe_msgbus()
+    bump_all()
+
+def unregister():
+    bpy.msgbus.clear_by_owner(_msgbus_owner)
+    for handler_list, handler in _HANDLERS:
+        if handler in handler_list:
+            handler_list.remove(handler)
+    _fingerprints.clear()
@@ -0,0 +1,121 @@
+"""
+后台配置写入
+
+主线程只提交数据快照（普通的 dict/list），序列化和写盘在后台线程完成：
+- 紧凑 JSON，先写临时文件再 os.replace，写入中断不会损坏原文件
+- 短时间内对同一文件的多次提交合并为一次写入（只写最后一次的数据）
+- 写入成功后才输出提交时附带的日志
+- 注销插件时先 flush 再 stop，结束并回收后台线程
+"""
+
+import json
+import os
+import threading
+
+# 合并窗口：提交后等待这段时间再写，期间的新提交覆盖旧数据
+WRITE_DELAY = 0.3
+_JSON_SEPARATORS = (',', ':')
+# 待删除文件的标记
+_REMOVE = object()
+
+_lock = threading.Lock()
+_condition = threading.Condition(_lock)
+_writer_state = {
+    'pending': {},     # 文件路径 -> (数据快照 / _REMOVE, 写入成功后输出的日志或 None)
+    'writing': False,
+    'flush_requested': False,
+    'stop_requested': False,
+    'thread': None,
+}
+
+def _write_file(filepath, data):
+    if data is _REMOVE:
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+        return
+    payload = json.dumps(data, ensure_ascii=False, separators=_JSON_SEPARATORS)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    temp_path = filepath + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, filepath)
+
+def _worker():
+    while True:
+        with _condition:
+            while not _writer_state['pending'] and not _writer_state['stop_requested']:
+                _condition.wait()
+            if not _writer_state['pending']:
+                return
+            # 等待合并窗口（新的提交不会提前结束等待，flush 和 stop 会）
+            _condition.wait_for(
+                lambda: _writer_state['flush_requested'] or _writer_state['stop_requested'],
+                WRITE_DELAY
+            )
+            _writer_state['flush_requested'] = False
+            batch = _writer_state['pending']
+            _writer_state['pending'] = {}
+            _writer_state['writing'] = True
+        try:
+            for filepath, (data, message) in batch.items():
+                try:
+                    _write_file(filepath, data)
+                except Exception as e:
+                    print(f"写入配置文件失败 {filepath}: {e}")
+                    continue
+                if message:
+                    print(message)
+        finally:
+            with _condition:
+                _writer_state['writing'] = False
+                _condition.notify_all()
+
+def _ensure_thread():
+    thread = _writer_state['thread']
+    if thread is None or not thread.is_alive():
+        _writer_state['stop_requested'] = False
+        thread = threading.Thread(target=_worker, name="colorful_connections_writer", daemon=True)
+        _writer_state['thread'] = thread
+        thread.start()
+
+def submit(filepath, data, message=None):
+    """提交写入（data 必须是之后不会再修改的快照），message 在写入成功后输出"""
+    with _condition:
+        _writer_state['pending'][filepath] = (data, message)
+        _ensure_thread()
+        _condition.notify_all()
+
+def submit_remove(filepath):
+    """提交删除，与同一文件之前未写入的数据合并"""
+    submit(filepath, _REMOVE)
+
+def is_busy():
+    with _condition:
+        return bool(_writer_state['pending']) or _writer_state['writing']
+
+def flush(timeout=5.0):
+    """等待所有提交写入完成（注销插件或需要立即读回文件时调用），返回是否完成"""
+    with _condition:
+        if _writer_state['pending']:
+            _writer_state['flush_requested'] = True
+            _condition.notify_all()
+        return _condition.wait_for(
+            lambda: not _writer_state['pending'] and not _writer_state['writing'],
+            timeout
+        )
+
+def stop(timeout=5.0):
+    """结束后台线程（先写完已提交的数据），注销插件时在 flush 之后调用"""
+    with _condition:
+        thread = _writer_state['thread']
+        if thread is None:
+            return
+        _writer_state['stop_requested'] = True
+        _condition.notify_all()
+    thread.join(timeout)
+    if not thread.is_alive():
+        _writer_state['thread'] = None
@@ -0,0 +1,625 @@
+"""
+节点树连线邻接索引
+
+socket.links 每次访问都要扫描整棵树的连线，大量节点时逐节点递归非常慢。
+这里按 tree.links 一次性建立邻接表（以节点指针为键），并提供多源遍历：
+所有起点一起入栈，共享同一个访问集合，开销只与实际经过的连线数量成正比。
+
+静音节点按内部连线只在对应的输入/输出接口之间传递，静音、无效和隐藏的连线不参与追踪。
+
+Reroute 链在建索引时折叠为逻辑边：源节点 -> 有序的 Reroute 路径 -> 汇节点，
+遍历时一条链只算一步，不再逐个 Reroute 递归。
+
+索引按 (节点树指针, 拓扑版本号) 缓存，拓扑版本由 change_tracker 维护。
+
+可选的跨节点组追踪按接口标识符（identifier）对应组节点接口和组内的
+Group Input/Output 接口；每个节点组数据块只分析一次，得到"组输入 -> 组输出"的流摘要，
+同一节点组被使用多少次都共用同一份摘要。
+
+几何节点的区域（重复、模拟、逐元素）通过 paired_output 隐式配对，没有实际连线。
+建索引时把配对关系加为不含连线的虚拟逻辑边，遍历能跟随数据穿过区域，绘制时没有对应的连线。
+"""
+
+# 节点树指针 -> (拓扑版本号, 索引)；进入节点组或分析节点组时会同时用到多棵树
+_index_cache = {}
+# 节点组指针 -> (拓扑版本号, 流摘要)
+_group_summary_cache = {}
+# 正在分析的节点组（防止异常的递归引用）
+_summary_in_progress = set()
+_EMPTY_SUMMARY = {'forward': {}, 'backward': {}}
+
+# 区域输入节点 bl_idname -> (输出流回输入, 输入直达输出)
+# 重复/模拟区域：输出的状态是下一次迭代（下一帧）的输入，迭代次数/跳过等也直接影响输出
+# 逐元素区域：没有迭代状态，输入的几何体决定输出的元素数量
+ZONE_VIRTUAL_EDGES = {
+    'GeometryNodeRepeatInput': (True, True),
+    'GeometryNodeSimulationInput': (True, True),
+    'GeometryNodeForeachGeometryElementInput': (False, True),
+}
+
+def build_flow_index(tree):
+    """
+    建立邻接表：
+        out[节点指针] -> [(link, 下游节点指针), ...]（只含输出接口可用的连线）
+        in[节点指针]  -> [(link, 上游节点指针), ...]（只含输入接口可用的连线）
+        nodes[节点指针] -> node
+        reroutes       -> Reroute 节点指针集合
+        groups[节点指针] -> 组节点引用的节点组
+        zones[区域输入节点指针] -> (bl_idname, 配对的区域输出节点指针)
+        muted[节点指针] -> 静音节点的内部连线对应表（见 _build_internal_link_map）
+    静音、无效和隐藏的连线不进入索引
+    逻辑边 chain_out/chain_in 中区域的虚拟边连线元组为空
+    """
+    out_links = {}
+    in_links = {}
+    nodes = {}
+    reroutes = set()
+    groups = {}
+    zones = {}
+    muted = {}
+    for node in tree.nodes:
+        ptr = node.as_pointer()
+        nodes[ptr] = node
+        if node.mute:
+            muted[ptr] = _build_internal_link_map(node)
+        if node.type == 'REROUTE':
+            reroutes.add(ptr)
+        elif node.type == 'GROUP' and getattr(node, 'node_tree', None) is not None:
+            groups[ptr] = node.node_tree
+        elif node.bl_idname in ZONE_VIRTUAL_EDGES:
+            paired_output = getattr(node, 'paired_output', None)
+            if paired_output is not None:
+                zones[ptr] = (node.bl_idname, paired_output.as_pointer())
+    for link in tree.links:
+        from_node = link.from_node
+        to_node = link.to_node
+        if from_node is None or to_node is None:
+            continue
+        from_ptr = from_node.as_pointer()
+        to_ptr = to_node.as_pointer()
+        # 静音、无效（如类型不兼容）、因接口隐藏而隐藏的连线不传递数据
+        if link.is_muted or not link.is_valid or getattr(link, 'is_hidden', False):
+            continue
+        if link.from_socket.enabled:
+            out_links.setdefault(from_ptr, []).append((link, to_ptr))
+        if link.to_socket.enabled:
+            in_links.setdefault(to_ptr, []).append((link, from_ptr))
+    chain_out = _build_chain_edges(out_links, reroutes)
+    chain_in = _build_chain_edges(in_links, reroutes)
+    _add_zone_edges(zones, chain_out, chain_in)
+    return {
+        'out': out_links,
+        'in': in_links,
+        'nodes': nodes,
+        'reroutes': reroutes,
+        'groups': groups,
+        'zones': zones,
+        'muted': muted,
+        'chain_out': chain_out,
+        'chain_in': chain_in,
+    }
+
+def _build_internal_link_map(node):
+    """
+    静音节点的数据只经内部连线从输入直通到输出，没有内部连线的输出只输出默认值：
+        forward[输入接口标识符]  -> 对应的输出接口标识符集合
+        backward[输出接口标识符] -> 对应的输入接口标识符集合
+    """
+    forward = {}
+    backward = {}
+    for internal_link in node.internal_links:
+        input_id = internal_link.from_socket.identifier
+        output_id = internal_link.to_socket.identifier
+        forward.setdefault(input_id, set()).add(output_id)
+        backward.setdefault(output_id, set()).add(input_id)
+    return {'forward': forward, 'backward': backward}
+
+def _add_zone_edges(zones, chain_out, chain_in):
+    """区域输入/输出之间的虚拟边（复制列表，不修改 Reroute 展开时共享的列表）"""
+    def add(from_ptr, to_ptr):
+        chain_out[from_ptr] = chain_out.get(from_ptr, []) + [((), to_ptr)]
+        chain_in[to_ptr] = chain_in.get(to_ptr, []) + [((), from_ptr)]
+    
+    for input_ptr, (bl_idname, output_ptr) in zones.items():
+        feedback, passthrough = ZONE_VIRTUAL_EDGES[bl_idname]
+        if feedback:
+            add(output_ptr, input_ptr)
+        if passthrough:
+            add(input_ptr, output_ptr)
+
+def _expand_chains(adjacency, reroutes, start_ptr):
+    """
+    从 start_ptr 出发穿过 Reroute 的所有逻辑边（显式栈，长链不会超出递归深度）
+    终点为非 Reroute 节点；链在 Reroute 处中断（无后续连线或成环）时终点为 None
+    """
+    edges = []
+    path = []
+    on_path = {start_ptr}
+    stack = [(None, iter(adjacency.get(start_ptr, ())))]
+    while stack:
+        for link, next_ptr in stack[-1][1]:
+            if next_ptr not in reroutes:
+                edges.append((tuple(path) + (link,), next_ptr))
+            elif next_ptr in on_path or not adjacency.get(next_ptr):
+                edges.append((tuple(path) + (link,), None))
+            else:
+                path.append(link)
+                on_path.add(next_ptr)
+                stack.append((next_ptr, iter(adjacency[next_ptr])))
+                break
+        else:
+            entered, _ = stack.pop()
+            if entered is not None:
+                on_path.discard(entered)
+                path.pop()
+    return edges
+
+def _build_chain_edges(adjacency, reroutes):
+    """
+    把穿过 Reroute 的连线折叠为逻辑边：
+        节点指针 -> [(有序连线元组, 终点节点指针), ...]
+    只为非 Reroute 节点和链首的 Reroute（没有连线进入）展开：链中间的 Reroute
+    若都保存自己的后缀，k 个 Reroute 的链要保存 O(k²) 个连线引用；
+    它们作为遍历起点时由 get_chain_edges 按需展开
+    """
+    targets = set()
+    for edges in adjacency.values():
+        for _, next_ptr in edges:
+            targets.add(next_ptr)
+    return {
+        ptr: _expand_chains(adjacency, reroutes, ptr)
+        for ptr in adjacency
+        if ptr not in reroutes or ptr not in targets
+    }
+
+def get_chain_edges(index, ptr, direction):
+    """节点的逻辑边（'forward' 下游 / 'backward' 上游）；链中间的 Reroute 按需展开，不缓存"""
+    chains = index['chain_out'] if direction == 'forward' else index['chain_in']
+    edges = chains.get(ptr)
+    if edges is None and ptr in index['reroutes']:
+        adjacency = index['out'] if direction == 'forward' else index['in']
+        edges = _expand_chains(adjacency, index['reroutes'], ptr)
+    return edges or ()
+
+def get_link_graph(index, direction):
+    """
+    逐条连线的邻接（Reroute 作为普通节点，区域加虚拟边），按需建立并存入索引：
+        状态 -> [(连线元组（一条连线，虚拟边为空）, 终点状态), ...]
+    状态一般是节点指针；静音节点另按进入接口拆分（见 _split_muted_states）。
+    每条连线只出现一次，用于对整张图做预计算（见 reachability）
+    """
+    cache_key = 'link_graph_out' if direction == 'forward' else 'link_graph_in'
+    graph = index.get(cache_key)
+    if graph is None:
+        adjacency = index['out'] if direction == 'forward' else index['in']
+        graph = {ptr: [((link,), next_ptr) for link, next_ptr in edges] for ptr, edges in adjacency.items()}
+        for input_ptr, (bl_idname, output_ptr) in index['zones'].items():
+            feedback, passthrough = ZONE_VIRTUAL_EDGES[bl_idname]
+            for from_ptr, to_ptr, enabled in ((output_ptr, input_ptr, feedback), (input_ptr, output_ptr, passthrough)):
+                if not enabled:
+                    continue
+                if direction == 'backward':
+                    from_ptr, to_ptr = to_ptr, from_ptr
+                graph[from_ptr] = graph.get(from_ptr, []) + [((), to_ptr)]
+        if index['muted']:
+            graph = _split_muted_states(index, graph, direction)
+        index[cache_key] = graph
+    return graph
+
+def _split_muted_states(index, graph, direction):
+    """
+    与 _walk_sockets 一致地处理静音节点：经连线进入静音节点时到达状态 (节点指针, 进入接口标识符)，
+    只沿内部连线对应的接口离开；节点指针本身只作为起点，沿所有接口和虚拟边离开。
+    虚拟边不经过接口，进入静音节点后无处可去，直接丢弃。
+    Reroute 在逻辑边中总被穿过，这里也不拆分
+    """
+    muted = {ptr: passthrough for ptr, passthrough in index['muted'].items() if ptr not in index['reroutes']}
+    
+    def retarget(socket_edges):
+        return [
+            (edge_links, end_ptr if end_ptr not in muted else (end_ptr, entry_id))
+            for edge_links, end_ptr, _, entry_id in socket_edges
+            if end_ptr not in muted or entry_id is not None
+        ]
+    
+    split = {}
+    for ptr, edges in graph.items():
+        socket_edges = _to_socket_edges(edges, direction)
+        split[ptr] = retarget(socket_edges)
+        passthrough = muted.get(ptr)
+        if passthrough is None:
+            continue
+        for entry_id, exit_ids in passthrough[direction].items():
+            split[(ptr, entry_id)] = retarget(
+                edge for edge in socket_edges if edge[2] is not None and edge[2] in exit_ids
+            )
+    return split
+
+def get_flow_index(tree, topology_version):
+    tree_ptr = tree.as_pointer()
+    cached = _index_cache.get(tree_ptr)
+    if cached is None or cached[0] != topology_version:
+        # 拓扑版本是全局的，版本变化后其他树的旧索引也一并丢弃
+        if cached is not None:
+            _index_cache.clear()
+        cached = (topology_version, build_flow_index(tree))
+        _index_cache[tree_ptr] = cached
+    return cached[1]
+
+def free_flow_index():
+    _index_cache.clear()
+    _group_summary_cache.clear()
+    _summary_in_progress.clear()
+
+def collect_direct_links(index, seed_nodes):
+    """
+    所有起点的直接连线 + 沿 Reroute 的延伸（ALL_SELECTED 模式）
+    逐条连线遍历，每个方向共享一个访问集合：选中的 Reroute 已被其他起点的链覆盖时不再重复展开，
+    开销只与实际经过的连线数量成正比
+    """
+    links = set()
+    seeds = [node.as_pointer() for node in seed_nodes]
+    reroutes = index['reroutes']
+    for adjacency in (index['out'], index['in']):
+        visited = set()
+        stack = []
+        # 起点自身总是展开一层；之后只穿过 Reroute
+        for ptr in seeds:
+            for link, next_ptr in adjacency.get(ptr, ()):
+                links.add(link)
+                if next_ptr in reroutes and next_ptr not in visited:
+                    visited.add(next_ptr)
+                    stack.append(next_ptr)
+        while stack:
+            ptr = stack.pop()
+            for link, next_ptr in adjacency.get(ptr, ()):
+                links.add(link)
+                if next_ptr in reroutes and next_ptr not in visited:
+                    visited.add(next_ptr)
+                    stack.append(next_ptr)
+    return links
+
+def collect_flow_links(index, seed_nodes, direction, hops=None):
+    """
+    从所有起点沿数据流遍历（'forward' 下游 / 'backward' 上游），共享同一个访问集合
+    树中有静音节点时改为按接口遍历，只沿内部连线实际传递的接口继续
+    按层广度优先：hops 不为 None 时在同一次遍历中记录每条连线的层号（起点的连线为 0，
+    一条 Reroute 链算一层），已有记录的连线保留较小的层号
+    """
+    if index['muted']:
+        links = set()
+        seeds = set(node.as_pointer() for node in seed_nodes)
+        _walk_sockets(index, [(ptr, None) for ptr in seeds], direction, None, links, seeds, hops)
+        return links
+    links = set()
+    visited = set(node.as_pointer() for node in seed_nodes)
+    frontier = list(visited)
+    depth = 0
+    while frontier:
+        next_frontier = []
+        for ptr in frontier:
+            for edge_links, end_ptr in get_chain_edges(index, ptr, direction):
+                links.update(edge_links)
+                if hops is not None:
+                    _record_hops(hops, edge_links, depth)
+                if end_ptr is not None and end_ptr not in visited:
+                    visited.add(end_ptr)
+                    next_frontier.append(end_ptr)
+        frontier = next_frontier
+        depth += 1
+    return links
+
+def _record_hops(hops, edge_links, depth):
+    for link in edge_links:
+        if hops.get(link, depth) >= depth:
+            hops[link] = depth
+
+def shortest_path_links(index, start_ptr, goal_ptr):
+    """
+    双向广度优先搜索 start -> goal 的一条最短路径（每条 Reroute 链算一步），
+    返回路径上的连线列表；不可达时返回 None
+    树中有静音节点或终点是 Reroute 时改为按接口的单向搜索（见 _shortest_socket_path）
+    """
+    if start_ptr == goal_ptr:
+        return []
+    if index['muted'] or goal_ptr in index['reroutes']:
+        return _shortest_socket_path(index, start_ptr, goal_ptr)
+    # 节点指针 -> (前一个/后一个节点指针, 逻辑边的连线元组)
+    parents = {start_ptr: None}
+    children = {goal_ptr: None}
+    depth_forward = {start_ptr: 0}
+    depth_backward = {goal_ptr: 0}
+    frontier_forward = [start_ptr]
+    frontier_backward = [goal_ptr]
+    meet = None
+    best_length = None
+    while (frontier_forward or frontier_backward) and meet is None:
+        # 每次扩展较小的一侧；相遇后仍处理完这一层，取其中最短的
+        # 一侧走完后继续扩展另一侧：经过链中间的 Reroute 时两个方向的逻辑边并不对称
+        if frontier_forward and (not frontier_backward or len(frontier_forward) <= len(frontier_backward)):
+            frontier, direction, seen, depth, other_depth = frontier_forward, 'forward', parents, depth_forward, depth_backward
+        else:
+            frontier, direction, seen, depth, other_depth = frontier_backward, 'backward', children, depth_backward, depth_forward
+        next_frontier = []
+        for ptr in frontier:
+            for edge_links, end_ptr in get_chain_edges(index, ptr, direction):
+                if end_ptr is None or end_ptr in seen:
+                    continue
+                seen[end_ptr] = (ptr, edge_links)
+                depth[end_ptr] = depth[ptr] + 1
+                if end_ptr in other_depth:
+                    length = depth[end_ptr] + other_depth[end_ptr]
+                    if best_length is None or length < best_length:
+                        best_length = length
+                        meet = end_ptr
+                next_frontier.append(end_ptr)
+        if frontier is frontier_forward:
+            frontier_forward = next_frontier
+        else:
+            frontier_backward = next_frontier
+    if meet is None:
+        return None
+
+    path = []
+    ptr = meet
+    while parents[ptr] is not None:
+        ptr, edge_links = parents[ptr]
+        path[:0] = edge_links
+    ptr = meet
+    while children[ptr] is not None:
+        ptr, edge_links = children[ptr]
+        # 上游方向的链按从下游到上游排列
+        path.extend(reversed(edge_links))
+    return path
+
+def _shortest_socket_path(index, start_ptr, goal_ptr):
+    """
+    按接口区分的广度优先搜索（状态与 _walk_sockets 相同，静音节点只沿内部连线继续），
+    两个方向的状态在静音节点处无法对齐，因此只从 start 向下游搜索；
+    终点是 Reroute 时它不是任何逻辑边的终点（两侧搜索可能无法相遇），这里在经过它的逻辑边中截取
+    """
+    chains = _get_socket_chains(index, 'forward')
+    goal_is_reroute = goal_ptr in index['reroutes']
+    # 状态 -> (前一个状态, 逻辑边的连线元组)
+    parents = {start_ptr: None}
+    frontier = [(start_ptr, start_ptr, None)]
+    goal_state = None
+    while frontier and goal_state is None:
+        next_frontier = []
+        for state, ptr, exits in frontier:
+            for edge_links, end_ptr, exit_id, entry_id in _get_node_socket_chains(index, chains, ptr, 'forward'):
+                if exits is not None and (exit_id is None or exit_id not in exits):
+                    continue
+                if goal_is_reroute:
+                    # 截取到终点 Reroute 为止的部分
+                    prefix = _chain_prefix_to(edge_links, goal_ptr)
+                    if prefix is not None:
+                        parents[goal_ptr] = (state, prefix)
+                        goal_state = goal_ptr
+                        break
+                if end_ptr is None:
+                    continue
+                next_exits = _socket_dependency(index, end_ptr, 'forward', entry_id, None)
+                next_state = end_ptr if next_exits is None else (end_ptr, entry_id)
+                if next_state in parents:
+                    continue
+                parents[next_state] = (state, edge_links)
+                if end_ptr == goal_ptr:
+                    goal_state = next_state
+                    break
+                next_frontier.append((next_state, end_ptr, next_exits))
+            if goal_state is not None:
+                break
+        frontier = next_frontier
+    if goal_state is None:
+        return None
+    
+    path = []
+    state = goal_state
+    while parents[state] is not None:
+        state, edge_links = parents[state]
+        path[:0] = edge_links
+    return path
+
+def _chain_prefix_to(edge_links, ptr):
+    for position, link in enumerate(edge_links):
+        if link.to_node.as_pointer() == ptr:
+            return edge_links[:position + 1]
+    return None
+
+def group_chain_units(index, links):
+    """
+    把要绘制的连线分组为绘制单元：完整包含在 links 中的 Reroute 链合并为一个单元（有序连线元组），
+    其余连线各自成为单元。分叉的链按每条源->汇路径各成一个单元，公共前缀会重复绘制
+    """
+    units = []
+    covered = set()
+    reroutes = index['reroutes']
+    in_links = index['in']
+    for ptr, edges in index['chain_out'].items():
+        # 链从非 Reroute 节点或没有输入的 Reroute 开始
+        if ptr in reroutes and in_links.get(ptr):
+            continue
+        for edge_links, _ in edges:
+            if len(edge_links) > 1 and all(link in links for link in edge_links):
+                units.append(edge_links)
+                covered.update(edge_links)
+    for link in links:
+        if link not in covered:
+            units.append((link,))
+    return units
+
+# --- 跨节点组追踪（按接口区分） ---
+def _to_socket_edges(edges, direction):
+    if direction == 'forward':
+        return [
+            (edge_links, end_ptr, edge_links[0].from_socket.identifier, edge_links[-1].to_socket.identifier)
+            if edge_links else (edge_links, end_ptr, None, None)
+            for edge_links, end_ptr in edges
+        ]
+    return [
+        (edge_links, end_ptr, edge_links[0].to_socket.identifier, edge_links[-1].from_socket.identifier)
+        if edge_links else (edge_links, end_ptr, None, None)
+        for edge_links, end_ptr in edges
+    ]
+
+def _get_socket_chains(index, direction):
+    """
+    带接口标识符的逻辑边（按需建立并存入索引）：
+        节点指针 -> [(有序连线元组, 终点节点指针, 离开当前节点的接口标识符, 进入终点的接口标识符), ...]
+    区域的虚拟边不经过接口，标识符为 None；链中间的 Reroute 不在其中（见 _get_node_socket_chains）
+    """
+    cache_key = 'socket_chain_out' if direction == 'forward' else 'socket_chain_in'
+    socket_chains = index.get(cache_key)
+    if socket_chains is None:
+        chains = index['chain_out'] if direction == 'forward' else index['chain_in']
+        socket_chains = {ptr: _to_socket_edges(edges, direction) for ptr, edges in chains.items()}
+        index[cache_key] = socket_chains
+    return socket_chains
+
+def _get_node_socket_chains(index, socket_chains, ptr, direction):
+    """链中间的 Reroute 只会作为遍历起点出现（逻辑边的终点不是 Reroute），此时按需展开"""
+    edges = socket_chains.get(ptr)
+    if edges is None and ptr in index['reroutes']:
+        edges = _to_socket_edges(get_chain_edges(index, ptr, direction), direction)
+    return edges or ()
+
+def _socket_dependency(index, ptr, direction, identifier, topology_version):
+    """
+    节点内部从一侧接口到另一侧接口的依赖：静音节点用内部连线，组节点用流摘要
+    （topology_version 为 None 时不穿过节点组）；没有依赖信息时返回 None，视为全部相连
+    """
+    passthrough = index['muted'].get(ptr)
+    if passthrough is not None:
+        return passthrough[direction].get(identifier, frozenset())
+    if topology_version is not None:
+        group = index['groups'].get(ptr)
+        if group is not None:
+            return get_group_summary(group, topology_version)[direction].get(identifier, frozenset())
+    return None
+
+def _walk_sockets(index, seeds, direction, topology_version, links, visited=None, hops=None, base_depth=0):
+    """
+    按接口区分的遍历：普通节点从任意接口进入都沿所有接口继续；
+    静音节点和组节点只沿与进入接口有依赖的接口继续（见 _socket_dependency）。
+    seeds: [(节点指针, 允许离开的接口标识符集合或 None 表示全部), ...]
+    限定了离开接口时不走区域的虚拟边：虚拟边不对应任何接口，只在节点整体参与时才成立
+    （例如拾取区域输入节点的某个输出，不应经虚拟边点亮整个区域）
+    按层广度优先，hops 不为 None 时记录连线层号（从 base_depth 开始）
+    返回经过的 (节点指针, 进入接口标识符) 集合，用于读取到达的组接口
+    """
+    chains = _get_socket_chains(index, direction)
+    if visited is None:
+        visited = set()
+    reached = set()
+    frontier = list(seeds)
+    depth = base_depth
+    while frontier:
+        next_frontier = []
+        for ptr, exits in frontier:
+            for edge_links, end_ptr, exit_id, entry_id in _get_node_socket_chains(index, chains, ptr, direction):
+                if exits is not None and (exit_id is None or exit_id not in exits):
+                    continue
+                links.update(edge_links)
+                if hops is not None:
+                    _record_hops(hops, edge_links, depth)
+                if end_ptr is None:
+                    continue
+                reached.add((end_ptr, entry_id))
+                next_exits = _socket_dependency(index, end_ptr, direction, entry_id, topology_version)
+                # 有接口依赖信息的节点按进入接口分别访问，其余节点只访问一次
+                state = end_ptr if next_exits is None else (end_ptr, entry_id)
+                if state in visited:
+                    continue
+                visited.add(state)
+                next_frontier.append((end_ptr, next_exits))
+        frontier = next_frontier
+        depth += 1
+    return reached
+
+def collect_socket_flow_links(index, node_ptr, identifier, is_output, direction, topology_version=None):
+    """
+    从单个接口出发遍历：接口在遍历方向一侧（下游的输出/上游的输入）时只沿它的连线离开，
+    在另一侧时先经节点内部的接口依赖换到离开的接口（没有依赖信息时为全部接口）
+    """
+    links = set()
+    if is_output == (direction == 'forward'):
+        exits = (identifier,)
+    else:
+        exits = _socket_dependency(index, node_ptr, direction, identifier, topology_version)
+    _walk_sockets(index, [(node_ptr, exits)], direction, topology_version, links)
+    return links
+
+def _interface_nodes(index, node_type):
+    return [ptr for ptr, node in index['nodes'].items() if node.type == node_type]
+
+def _summarize_group(group_tree, topology_version):
+    index = get_flow_index(group_tree, topology_version)
+    input_nodes = _interface_nodes(index, 'GROUP_INPUT')
+    output_nodes = _interface_nodes(index, 'GROUP_OUTPUT')
+    output_set = set(output_nodes)
+    input_set = set(input_nodes)
+    summary = {'forward': {}, 'backward': {}}
+    # 组输入接口 k -> 能到达的组输出接口
+    input_ids = {socket.identifier for ptr in input_nodes for socket in index['nodes'][ptr].outputs}
+    for identifier in input_ids:
+        reached = _walk_sockets(index, [(ptr, (identifier,)) for ptr in input_nodes], 'forward', topology_version, set())
+        summary['forward'][identifier] = frozenset(entry for ptr, entry in reached if ptr in output_set)
+    # 组输出接口 k -> 来源于哪些组输入接口
+    output_ids = {socket.identifier for ptr in output_nodes for socket in index['nodes'][ptr].inputs}
+    for identifier in output_ids:
+        reached = _walk_sockets(index, [(ptr, (identifier,)) for ptr in output_nodes], 'backward', topology_version, set())
+        summary['backward'][identifier] = frozenset(entry for ptr, entry in reached if ptr in input_set)
+    return summary
+
+def get_group_summary(group_tree, topology_version):
+    """
+    节点组的流摘要（按节点组数据块缓存）：
+        forward[组输入接口标识符]  -> 受其影响的组输出接口标识符集合
+        backward[组输出接口标识符] -> 影响它的组输入接口标识符集合
+    组节点的接口标识符与组内 Group Input/Output 的接口标识符一致，可直接对应；嵌套的节点组递归使用各自的摘要
+    """
+    group_ptr = group_tree.as_pointer()
+    cached = _group_summary_cache.get(group_ptr)
+    if cached is not None and cached[0] == topology_version:
+        return cached[1]
+    if group_ptr in _summary_in_progress:
+        return _EMPTY_SUMMARY
+    _summary_in_progress.add(group_ptr)
+    try:
+        summary = _summarize_group(group_tree, topology_version)
+    finally:
+        _summary_in_progress.discard(group_ptr)
+    _group_summary_cache[group_ptr] = (topology_version, summary)
+    return summary
+
+def collect_group_flow_links(index, seed_nodes, direction, topology_version, parent=None, hops=None):
+    """
+    跨节点组的数据流遍历：组节点按流摘要只沿相连的接口继续
+    parent: (父级节点树的索引, 父级中对应的组节点指针)；当前编辑的是节点组时，
+    到达组输出（上游方向为组输入）后经父级节点树继续，重新进入本组的接口再从组内继续
+    hops: 见 collect_flow_links；经父级绕回的连线排在已有的层之后
+    """
+    links = set()
+    visited = set(node.as_pointer() for node in seed_nodes)
+    reached = _walk_sockets(index, [(ptr, None) for ptr in visited], direction, topology_version, links, visited, hops)
+    if parent is None:
+        return links
+    parent_index, group_ptr = parent
+    leave_type, enter_type = ('GROUP_OUTPUT', 'GROUP_INPUT') if direction == 'forward' else ('GROUP_INPUT', 'GROUP_OUTPUT')
+    leave_nodes = set(_interface_nodes(index, leave_type))
+    enter_nodes = _interface_nodes(index, enter_type)
+    handled = set()
+    while True:
+        exits = {entry for ptr, entry in reached if ptr in leave_nodes} - handled
+        if not exits:
+            break
+        handled |= exits
+        # 父级中的连线不在当前编辑器里绘制，只用来确定重新进入的接口
+        parent_reached = _walk_sockets(parent_index, [(group_ptr, exits)], direction, topology_version, set())
+        entries = frozenset(entry for ptr, entry in parent_reached if ptr == group_ptr)
+        if not entries:
+            break
+        base_depth = max(hops.values(), default=-1) + 1 if hops is not None else 0
+        reached = _walk_sockets(index, [(ptr, entries) for ptr in enter_nodes], direction, topology_version, links, visited, hops, base_depth)
+    return links
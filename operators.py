@@ -1,5 +1,6 @@
 import bpy
 from . import utils
+from . import change_tracker
 
 class NODE_OT_select_flow_nodes(bpy.types.Operator):
     """选中当前数据流方向上的所有相关节点"""
@@ -14,34 +15,21 @@ class NODE_OT_select_flow_nodes(bpy.types.Operator):
     def execute(self, context):
         # 获取当前设置
         settings = utils.get_panel_settings()
-        direction = settings.get('flow_direction', 'DOWNSTREAM')
         active_node = context.active_node
         
         if not active_node:
             return {'CANCELLED'}
             
-        # 使用 utils 中的递归逻辑获取节点集合
-        visited_links = set()
+        # 与绘制共用按拓扑版本缓存的邻接索引（可选穿过节点组）
+        tree = context.space_data.edit_tree or context.space_data.node_tree
+        change_tracker.observe_tree(tree)
+        group_parent = utils.get_group_parent(context.space_data, tree) if tree != context.space_data.node_tree else None
+        visited_links = utils.collect_active_flow_links(tree, settings, active_node, group_parent)
         
-        if direction == 'BOTH':
-            # 双向模式：使用两个独立的 visited_nodes 集合，避免相互干扰
-            visited_nodes_forward = set()
-            visited_nodes_backward = set()
-            
-            # 向下遍历
-            utils.traverse_recursive(active_node, 'forward', visited_links, visited_nodes_forward)
-            # 向上遍历
-            utils.traverse_recursive(active_node, 'backward', visited_links, visited_nodes_backward)
-            
-            # 合并两个方向的节点
-            visited_nodes = visited_nodes_forward | visited_nodes_backward
-        else:
-            # 单向模式：使用一个集合即可
-            visited_nodes = set()
-            if direction == 'DOWNSTREAM':
-                utils.traverse_recursive(active_node, 'forward', visited_links, visited_nodes)
-            elif direction == 'UPSTREAM':
-                utils.traverse_recursive(active_node, 'backward', visited_links, visited_nodes)
+        visited_nodes = {active_node}
+        for link in visited_links:
+            visited_nodes.add(link.from_node)
+            visited_nodes.add(link.to_node)
             
         # 执行选择
         # bpy.ops.node.select_all(action='DESELECT') # 可选：是否先取消全选
@@ -50,8 +38,115 @@ class NODE_OT_select_flow_nodes(bpy.types.Operator):
             
         return {'FINISHED'}
 
+class NODE_OT_pick_trace_socket(bpy.types.Operator):
+    """拾取节点编辑器中的接口，接口流模式只追踪从该接口可达的连线"""
+    bl_idname = "node.pick_trace_socket"
+    bl_label = "拾取追踪接口"
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return context.space_data and context.space_data.type == 'NODE_EDITOR' and context.space_data.edit_tree
+
+    def _find_window_region(self, event):
+        for region in self._area.regions:
+            if region.type != 'WINDOW':
+                continue
+            if region.x <= event.mouse_x < region.x + region.width and region.y <= event.mouse_y < region.y + region.height:
+                return region
+        return None
+
+    def _pick(self, context, event):
+        region = self._find_window_region(event)
+        if region is None:
+            return False
+        tree = context.space_data.edit_tree
+        hit = utils.find_socket_at(tree, region, event.mouse_x - region.x, event.mouse_y - region.y)
+        if hit is None:
+            return False
+        node, socket, is_output = hit
+        settings = context.scene.colorful_connections_settings
+        settings.trace_socket_tree = tree.name
+        settings.trace_socket_node = node.name
+        settings.trace_socket_identifier = socket.identifier
+        settings.trace_socket_is_output = is_output
+        settings.trace_mode = 'ACTIVE_SOCKET'
+        self._area.tag_redraw()
+        return True
+
+    def invoke(self, context, event):
+        self._area = context.area
+        # 在节点编辑区内调用（快捷键/搜索）时直接拾取鼠标下的接口
+        if context.region and context.region.type == 'WINDOW' and self._pick(context, event):
+            return {'FINISHED'}
+        # 从侧边栏按钮调用时进入吸管模式，等待在节点编辑区点击
+        context.window.cursor_modal_set('EYEDROPPER')
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'LEFTMOUSE' and event.value == 'PRESS':
+            if self._pick(context, event):
+                context.window.cursor_modal_restore()
+                return {'FINISHED'}
+            self.report({'INFO'}, "鼠标下没有接口")
+            return {'RUNNING_MODAL'}
+        if event.type in {'RIGHTMOUSE', 'ESC'}:
+            context.window.cursor_modal_restore()
+            return {'CANCELLED'}
+        # 拾取时仍可平移/缩放视图
+        if event.type in {'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE', 'TRACKPADPAN', 'TRACKPADZOOM'}:
+            return {'PASS_THROUGH'}
+        return {'RUNNING_MODAL'}
+
+class NODE_OT_hover_trace(bpy.types.Operator):
+    """鼠标悬停在节点上时显示它的数据流（再次执行或切换追踪模式时停止）"""
+    bl_idname = "node.hover_trace"
+    bl_label = "悬停追踪"
+
+    @classmethod
+    def poll(cls, context):
+        return context.space_data and context.space_data.type == 'NODE_EDITOR'
+
+    def invoke(self, context, event):
+        if utils.is_hover_trace_running():
+            # 正在运行的操作符会在下一个事件时结束
+            utils.stop_hover_trace()
+            context.area.tag_redraw()
+            return {'FINISHED'}
+        self._area = context.area
+        utils.start_hover_trace()
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def _finish(self):
+        utils.stop_hover_trace()
+        self._area.tag_redraw()
+
+    def modal(self, context, event):
+        settings = getattr(context.scene, 'colorful_connections_settings', None)
+        if not utils.is_hover_trace_running() or settings is None or settings.trace_mode != 'HOVER':
+            self._finish()
+            return {'FINISHED'}
+        if event.type == 'MOUSEMOVE':
+            space = self._area.spaces.active
+            tree = getattr(space, 'edit_tree', None)
+            node = None
+            if tree is not None:
+                for region in self._area.regions:
+                    if region.type == 'WINDOW' and region.x <= event.mouse_x < region.x + region.width \
+                            and region.y <= event.mouse_y < region.y + region.height:
+                        node = utils.find_node_at(tree, region, event.mouse_x - region.x, event.mouse_y - region.y)
+                        break
+            if utils.set_hover_node(tree, node):
+                self._area.tag_redraw()
+        # 不拦截任何事件，编辑器照常操作
+        return {'PASS_THROUGH'}
+
 classes = [
-    NODE_OT_select_flow_nodes
+    NODE_OT_select_flow_nodes,
+    NODE_OT_pick_trace_socket,
+    NODE_OT_hover_trace,
 ]
 
 def register():
@@ -1,6 +1,12 @@
 import bpy
 import json
 import os
+import hashlib
+import time
+from . import utils
+from . import preset_library
+from . import preset_previews
+from . import config_writer
 
 # 全局变量初始化
 _loading_settings = False
@@ -97,33 +103,139 @@ def get_presets_filepath():
             os.makedirs(presets_dir, exist_ok=True)
             return os.path.join(presets_dir, 'gradient_presets.json')
 
-# 保存预设到文件
-def save_presets_to_file(settings):
-    """将预设保存到JSON文件"""
+# 预设库目录（与旧的 gradient_presets.json 同目录）
+def get_preset_library_dirpath():
+    return os.path.join(os.path.dirname(get_presets_filepath()), 'library')
+
+def get_preset_index_filepath():
+    return preset_library.get_index_path(get_preset_library_dirpath())
+
+# --- 配置文件解析缓存 ---
+# key 为文件路径，值为 ((mtime_ns, size), 解析后的数据, 内容哈希)
+# 批量打开文件时，未变化的 JSON 不会被重复读取和解析
+_parsed_config_cache = {}
+
+def _get_file_stamp(filepath):
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _read_config_file(filepath):
+    """读取并解析 JSON 配置文件（按 mtime/size 缓存），返回 (数据, 内容哈希)，文件不存在时返回 (None, '')"""
+    stamp = _get_file_stamp(filepath)
+    if stamp is None:
+        _parsed_config_cache.pop(filepath, None)
+        return None, ''
+    cached = _parsed_config_cache.get(filepath)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    content_hash = hashlib.sha1(raw).hexdigest()
+    data = json.loads(raw.decode('utf-8'))
+    _parsed_config_cache[filepath] = (stamp, data, content_hash)
+    return data, content_hash
+
+def get_config_hash():
+    """预设文件和全局设置文件的组合内容哈希（两个文件都不存在时为空字符串）"""
+    hashes = []
+    for filepath in (get_preset_index_filepath(), get_settings_filepath()):
+        try:
+            _, content_hash = _read_config_file(filepath)
+        except Exception as e:
+            print(f"读取配置文件失败: {e}")
+            content_hash = ''
+        hashes.append(content_hash)
+    if not any(hashes):
+        return ''
+    return hashlib.sha1(':'.join(hashes).encode('ascii')).hexdigest()
+
+def _store_config_hash(settings):
+    """记录场景设置当前对应的配置内容哈希"""
     try:
-        presets_data = []
-        for preset in settings.gradient_presets:
-            preset_data = {
-                'name': preset.name,
-                'colors': []
-            }
-            for color_item in preset.colors:
-                preset_data['colors'].append({
-                    'color': list(color_item.color[:3]),  # RGB
-                    'alpha': getattr(color_item, 'alpha', 1.0)  # 透明度
-                })
-            presets_data.append(preset_data)
-        
-        filepath = get_presets_filepath()
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(presets_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"预设已保存到: {filepath}")
+        settings.config_hash = get_config_hash()
+    except (AttributeError, RuntimeError, ReferenceError) as e:
+        print(f"记录配置哈希失败: {e}")
+
+def _get_library_entries(settings):
+    """由场景中的预设列表（只含元数据）构造预设库索引条目"""
+    return [
+        {'key': p.key, 'name': p.name, 'count': p.color_count, 'hash': p.content_hash}
+        for p in settings.gradient_presets if p.key
+    ]
+
+# 后台写入完成后再刷新文件戳和配置哈希（定时器轮询，bpy 只能在主线程访问）
+CONFIG_WRITE_POLL_INTERVAL = 0.1
+
+def _after_config_write():
+    if not bpy.app.timers.is_registered(_poll_config_writes):
+        bpy.app.timers.register(_poll_config_writes, first_interval=CONFIG_WRITE_POLL_INTERVAL)
+
+def _poll_config_writes():
+    if config_writer.is_busy():
+        return CONFIG_WRITE_POLL_INTERVAL
+    _refresh_synced_stamps()
+    scene = _get_active_scene()
+    if scene is not None:
+        _store_config_hash(scene.colorful_connections_settings)
+    return None
+
+# 保存单个预设到预设库
+def save_preset_to_library(settings, preset):
+    """只写入该预设的文件和索引"""
+    try:
+        if not preset.key:
+            preset.key = preset_library.new_preset_key()
+        colors = [
+            {'color': list(color_item.color[:3]), 'alpha': getattr(color_item, 'alpha', 1.0)}
+            for color_item in preset.colors
+        ]
+        library_dir = get_preset_library_dirpath()
+        entry = preset_library.save_preset(
+            library_dir, _get_library_entries(settings), preset.key, preset.name, colors
+        )
+        preset.color_count = entry['count']
+        preset.content_hash = entry['hash']
+        _after_config_write()
     except Exception as e:
         print(f"保存预设失败: {e}")
         import traceback
         traceback.print_exc()
 
+# 从预设库删除单个预设
+def delete_preset_from_library(settings, key):
+    """删除该预设的文件并更新索引（调用前应已从场景列表中移除）"""
+    if not key:
+        return
+    try:
+        entries = _get_library_entries(settings)
+        preset_library.delete_preset(get_preset_library_dirpath(), entries, key)
+        _after_config_write()
+    except Exception as e:
+        print(f"删除预设失败: {e}")
+        import traceback
+        traceback.print_exc()
+
+def ensure_preset_colors(preset):
+    """按需把预设颜色从预设库读入场景（应用/预览前调用），返回是否可用"""
+    if not preset.key or len(preset.colors) == preset.color_count:
+        return True
+    try:
+        colors = preset_library.load_preset_colors(get_preset_library_dirpath(), preset.key, preset.content_hash)
+    except Exception as e:
+        print(f"读取预设颜色失败: {e}")
+        return False
+    preset.colors.clear()
+    for color_data in colors:
+        color_item = preset.colors.add()
+        color_rgb = color_data['color']
+        color_item.color = (color_rgb[0], color_rgb[1], color_rgb[2])
+        color_item.alpha = color_data['alpha']
+    preset.color_count = len(colors)
+    return True
+
 # 保存全局设置到文件（仅用于手动保存）
 def _save_global_settings_internal(settings):
     """内部保存函数（仅用于手动保存）"""
@@ -133,6 +245,10 @@ def _save_global_settings_internal(settings):
             'trace_mode': settings.trace_mode,
             'flow_direction': settings.flow_direction,
             'lock_flow': settings.lock_flow,
+            'trace_through_groups': settings.trace_through_groups,
+            'path_mode': settings.path_mode,
+            'hop_fade': settings.hop_fade,
+            'hop_fade_range': settings.hop_fade_range,
             
             # 颜色设置
             'connection_color_type': settings.connection_color_type,
@@ -147,6 +263,10 @@ def _save_global_settings_internal(settings):
             'node_border_thickness': settings.node_border_thickness,
             'enable_colorful_connections': settings.enable_colorful_connections,
             'overall_opacity': getattr(settings, 'overall_opacity', 1.0),
+            'cache_static_layers': getattr(settings, 'cache_static_layers', False),
+            'merge_reroute_chains': getattr(settings, 'merge_reroute_chains', False),
+            'flow_style': getattr(settings, 'flow_style', 'GRADIENT'),
+            'particles_per_link': getattr(settings, 'particles_per_link', 4),
             'backing_color_rgb': list(getattr(settings, 'backing_color_rgb', (0.0, 0.0, 0.0))),
             'backing_color_alpha': getattr(settings, 'backing_color_alpha', 0.55),
             
@@ -169,11 +289,10 @@ def _save_global_settings_internal(settings):
                 'alpha': getattr(color_item, 'alpha', 1.0)
             })
         
+        # 序列化和写盘在后台线程完成
         filepath = get_settings_filepath()
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(settings_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"全局设置已保存到: {filepath}")
+        config_writer.submit(filepath, settings_data, f"全局设置已保存到: {filepath}")
+        _after_config_write()
     except Exception as e:
         print(f"保存全局设置失败: {e}")
         import traceback
@@ -198,13 +317,11 @@ def load_global_settings(settings):
     _loading_settings = True
     try:
         filepath = get_settings_filepath()
-        if not os.path.exists(filepath):
+        settings_data, _ = _read_config_file(filepath)
+        if settings_data is None:
             print(f"全局设置文件不存在: {filepath}")
             return
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            settings_data = json.load(f)
-        
         if not settings_data:
             return
         
@@ -215,6 +332,14 @@ def load_global_settings(settings):
             settings.flow_direction = settings_data['flow_direction']
         if 'lock_flow' in settings_data:
             settings.lock_flow = settings_data['lock_flow']
+        if 'trace_through_groups' in settings_data:
+            settings.trace_through_groups = settings_data['trace_through_groups']
+        if 'path_mode' in settings_data:
+            settings.path_mode = settings_data['path_mode']
+        if 'hop_fade' in settings_data:
+            settings.hop_fade = settings_data['hop_fade']
+        if 'hop_fade_range' in settings_data:
+            settings.hop_fade_range = settings_data['hop_fade_range']
         
         # 加载颜色设置
         if 'connection_color_type' in settings_data:
@@ -273,6 +398,14 @@ def load_global_settings(settings):
             settings.enable_colorful_connections = settings_data['enable_colorful_connections']
         if 'overall_opacity' in settings_data:
             settings.overall_opacity = settings_data['overall_opacity']
+        if 'cache_static_layers' in settings_data:
+            settings.cache_static_layers = settings_data['cache_static_layers']
+        if 'merge_reroute_chains' in settings_data:
+            settings.merge_reroute_chains = settings_data['merge_reroute_chains']
+        if 'flow_style' in settings_data:
+            settings.flow_style = settings_data['flow_style']
+        if 'particles_per_link' in settings_data:
+            settings.particles_per_link = settings_data['particles_per_link']
         # 加载底层背景颜色（兼容新旧格式）
         if 'backing_color' in settings_data:
             # 旧格式：RGBA向量
@@ -325,36 +458,35 @@ def load_presets_from_file(settings):
         return
     
     try:
-        filepath = get_presets_filepath()
-        if not os.path.exists(filepath):
-            print(f"预设文件不存在: {filepath}")
-            return
-        
-        with open(filepath, 'r', encoding='utf-8') as f:
-            presets_data = json.load(f)
-        
-        if not presets_data:
+        library_dir = get_preset_library_dirpath()
+        index_path = preset_library.get_index_path(library_dir)
+        entries, _ = _read_config_file(index_path)
+        if entries is None:
+            # 首次使用预设库：从旧的 gradient_presets.json 迁移
+            preset_library.migrate_legacy_presets(library_dir, get_presets_filepath())
+            config_writer.flush()
+            entries, _ = _read_config_file(index_path)
+        entries = [e for e in entries or [] if e.get('key')]
+        
+        # 场景中的预设列表与索引一致时不重建
+        current = [(p.key, p.name, p.content_hash) for p in settings.gradient_presets]
+        if current == [(e['key'], e.get('name', '新预设'), e.get('hash', '')) for e in entries]:
             return
         
-        # 清空现有预设
+        # 只加载元数据，颜色在应用/预览时再读取
         settings.gradient_presets.clear()
-        
-        # 加载预设
-        for preset_data in presets_data:
+        for entry in entries:
             preset = settings.gradient_presets.add()
-            preset.name = preset_data.get('name', '新预设')
-            
-            for color_data in preset_data.get('colors', []):
-                color_item = preset.colors.add()
-                color_rgb = color_data.get('color', [1.0, 1.0, 1.0])
-                color_item.color = (color_rgb[0], color_rgb[1], color_rgb[2])
-                color_item.alpha = color_data.get('alpha', 1.0)
+            preset.name = entry.get('name', '新预设')
+            preset.key = entry['key']
+            preset.color_count = int(entry.get('count', 0))
+            preset.content_hash = entry.get('hash', '')
         
         # 设置活动索引
         if len(settings.gradient_presets) > 0:
             settings.active_preset_index = 0
         
-        print(f"已加载 {len(settings.gradient_presets)} 个预设从: {filepath}")
+        print(f"已加载 {len(settings.gradient_presets)} 个预设从: {index_path}")
     except Exception as e:
         print(f"加载预设失败: {e}")
         import traceback
@@ -364,11 +496,19 @@ def load_presets_from_file(settings):
 class UI_UL_gradient_preset_list(bpy.types.UIList):
     """预设列表UI"""
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
+        # 渐变缩略图（按内容哈希缓存），没有时退回通用图标
+        icon_id = preset_previews.get_preset_icon_id(get_preset_library_dirpath(), item.key, item.content_hash)
         if self.layout_type in {'DEFAULT', 'COMPACT'}:
-            layout.label(text=item.name, icon='PRESET')
+            if icon_id:
+                layout.label(text=item.name, icon_value=icon_id)
+            else:
+                layout.label(text=item.name, icon='PRESET')
         elif self.layout_type in {'GRID'}:
             layout.alignment = 'CENTER'
-            layout.label(text="", icon='PRESET')
+            if icon_id:
+                layout.label(text="", icon_value=icon_id)
+            else:
+                layout.label(text="", icon='PRESET')
 
 # 辅助函数：颜色更新回调（不再自动保存）
 def _gradient_color_update(self, context):
@@ -408,6 +548,10 @@ class GradientPreset(bpy.types.PropertyGroup):
     name: bpy.props.StringProperty(name="预设名称", default="新预设")
     colors: bpy.props.CollectionProperty(type=GradientColorItem)
     active_color_index: bpy.props.IntProperty(default=0)
+    # 预设库中的条目：颜色按需读入 colors
+    key: bpy.props.StringProperty(default="", options={'HIDDEN'})
+    color_count: bpy.props.IntProperty(default=0, options={'HIDDEN'})
+    content_hash: bpy.props.StringProperty(default="", options={'HIDDEN'})
 
 class ColorfulConnectionsSettings(bpy.types.PropertyGroup):
     """彩色连线设置"""
@@ -419,6 +563,9 @@ class ColorfulConnectionsSettings(bpy.types.PropertyGroup):
         items=[
             ('ALL_SELECTED', '所有选中', '显示所有被选中节点的连线'),
             ('ACTIVE_FLOW', '活动节点流', '仅显示当前活动节点的数据流向'),
+            ('ACTIVE_SOCKET', '接口流', '仅显示拾取的接口的数据流向'),
+            ('HOVER', '悬停', '显示鼠标悬停的节点的数据流向，不改变选择'),
+            ('PATH', '路径', '选中两个节点时只显示它们之间的路径'),
         ],
         default='ACTIVE_FLOW'
     )
@@ -440,6 +587,36 @@ class ColorfulConnectionsSettings(bpy.types.PropertyGroup):
         default=False
     )
     
+    hop_fade: bpy.props.BoolProperty(
+        name="按距离淡化",
+        description="活动节点流中离活动节点越远（经过的节点越多）的连线越淡",
+        default=False
+    )
+    
+    hop_fade_range: bpy.props.IntProperty(
+        name="淡化层数",
+        description="经过多少层节点后淡化到最淡",
+        default=6,
+        min=1,
+        max=64
+    )
+    
+    path_mode: bpy.props.EnumProperty(
+        name="路径",
+        description="路径模式下显示的路径",
+        items=[
+            ('SHORTEST', '最短路径', '只显示一条经过节点最少的路径'),
+            ('ALL', '全部路径', '显示两个节点之间所有路径上的连线'),
+        ],
+        default='SHORTEST'
+    )
+    
+    trace_through_groups: bpy.props.BoolProperty(
+        name="穿过节点组追踪",
+        description="追踪数据流时按组接口对应关系穿过节点组：只沿实际相连的组输出继续；在节点组内部时经父级节点树从组输出绕回组输入",
+        default=False
+    )
+    
     enable_type_based_colors: bpy.props.BoolProperty(
         name="根据数据类型着色",
         description="启用后，不同数据类型的连线会使用不同的色相偏移，便于区分数据类型",
@@ -463,7 +640,7 @@ class ColorfulConnectionsSettings(bpy.types.PropertyGroup):
         description="常量类型渐变中使用的颜色数量",
         default=5,
         min=2,
-        max=10,
+        soft_max=32,
         update=lambda self, context: self._update_color_count_and_save(context)
     )
     
@@ -474,7 +651,7 @@ class ColorfulConnectionsSettings(bpy.types.PropertyGroup):
         description="域类型渐变中使用的颜色数量",
         default=5,
         min=2,
-        max=10,
+        soft_max=32,
         update=lambda self, context: self._update_field_color_count_and_save(context)
     )
     
@@ -555,6 +732,13 @@ class ColorfulConnectionsSettings(bpy.types.PropertyGroup):
     gradient_presets: bpy.props.CollectionProperty(type=GradientPreset)
     active_preset_index: bpy.props.IntProperty(default=-1)
     last_applied_preset_index: bpy.props.IntProperty(default=-1)  # 最后一次应用的预设索引
+    # 场景设置对应的配置文件内容哈希，打开文件时哈希一致则无需重建预设和颜色集合
+    config_hash: bpy.props.StringProperty(default="", options={'HIDDEN'})
+    # 接口流模式拾取的接口（随场景保存，不写入全局配置）
+    trace_socket_tree: bpy.props.StringProperty(default="", options={'HIDDEN'})
+    trace_socket_node: bpy.props.StringProperty(default="", options={'HIDDEN'})
+    trace_socket_identifier: bpy.props.StringProperty(default="", options={'HIDDEN'})
+    trace_socket_is_output: bpy.props.BoolProperty(default=True, options={'HIDDEN'})
     
     animation_speed: bpy.props.FloatProperty(
         name="动画速度",
@@ -594,6 +778,36 @@ class ColorfulConnectionsSettings(bpy.types.PropertyGroup):
         max=1.0
     )
     
+    flow_style: bpy.props.EnumProperty(
+        name="流动样式",
+        description="选择数据流动画的显示方式",
+        items=[
+            ('GRADIENT', '渐变流动', '沿连线流动的循环渐变色'),
+            ('PARTICLES', '流动粒子', '沿连线移动的小圆点，直观显示数据方向'),
+        ],
+        default='GRADIENT'
+    )
+    
+    particles_per_link: bpy.props.IntProperty(
+        name="每条连线粒子数",
+        description="流动粒子样式下每条连线上的粒子数量（粒子位置在GPU上计算）",
+        default=4,
+        min=1,
+        max=64
+    )
+    
+    merge_reroute_chains: bpy.props.BoolProperty(
+        name="合并转接点链",
+        description="把经过转接点（Reroute）的连线合并为一条连续的线，渐变连续流动，中间不画端点圆圈",
+        default=False
+    )
+    
+    cache_static_layers: bpy.props.BoolProperty(
+        name="缓存静态层",
+        description="将底层背景和端点圆圈渲染到离屏纹理，仅在视图、布局、数据流或设置变化时重绘，动画帧只重绘流动的渐变线（端点圆圈会显示在渐变线下方）",
+        default=False
+    )
+    
     backing_color_rgb: bpy.props.FloatVectorProperty(
         name="底层背景颜色",
         description="设置连线底层背景的颜色（RGB）",
@@ -637,10 +851,11 @@ class NODE_OT_save_gradient_preset(bpy.types.Operator):
             new_color.color = color_item.color[:]
             new_color.alpha = getattr(color_item, 'alpha', 1.0)
         
+        preset.color_count = len(preset.colors)
         settings.active_preset_index = len(settings.gradient_presets) - 1
         
-        # 保存到文件
-        save_presets_to_file(settings)
+        # 只写入新预设和索引
+        save_preset_to_library(settings, preset)
         
         return {'FINISHED'}
 
@@ -661,6 +876,9 @@ class NODE_OT_apply_gradient_preset(bpy.types.Operator):
             return {'CANCELLED'}
         
         preset = settings.gradient_presets[idx]
+        if not ensure_preset_colors(preset):
+            self.report({'ERROR'}, "读取预设颜色失败")
+            return {'CANCELLED'}
         
         # 清空当前颜色
         settings.gradient_colors.clear()
@@ -709,19 +927,15 @@ class NODE_OT_delete_gradient_preset(bpy.types.Operator):
         if idx < 0 or idx >= len(settings.gradient_presets):
             return {'CANCELLED'}
         
+        key = settings.gradient_presets[idx].key
         settings.gradient_presets.remove(idx)
         
         # 调整活动索引
         if settings.active_preset_index >= len(settings.gradient_presets):
             settings.active_preset_index = len(settings.gradient_presets) - 1
         
-        # 只保存预设到文件（预设操作应该保存，但全局设置不自动保存）
-        try:
-            save_presets_to_file(settings)
-        except Exception as e:
-            print(f"删除预设时出错: {e}")
-            import traceback
-            traceback.print_exc()
+        # 只删除该预设的文件并更新索引（全局设置不自动保存）
+        delete_preset_from_library(settings, key)
         
         return {'FINISHED'}
 
@@ -739,6 +953,7 @@ class NODE_PT_colorful_connections_panel(bpy.types.Panel):
         
         # 获取面板设置
         settings = scene.colorful_connections_settings
+        request_config_sync(scene)
 
         col = layout.column()
         
@@ -790,9 +1005,36 @@ class NODE_PT_colorful_connections_panel(bpy.types.Panel):
             # 固定流选项
             row = col.row()
             row.prop(settings, "lock_flow", text="固定当前流", icon='LOCKED' if settings.lock_flow else 'UNLOCKED')
+            col.prop(settings, "trace_through_groups")
+            row = col.row(align=True)
+            row.prop(settings, "hop_fade")
+            sub = row.row(align=True)
+            sub.active = settings.hop_fade
+            sub.prop(settings, "hop_fade_range", text="层数")
             
             # 快速选择按钮
             op = col.operator("node.select_flow_nodes", text="选中数据流节点", icon='RESTRICT_SELECT_OFF')
+        elif settings.trace_mode == 'PATH':
+            row = col.row()
+            row.prop(settings, "path_mode", expand=True)
+            if len(getattr(context, 'selected_nodes', None) or ()) != 2:
+                col.label(text="选中两个节点以显示路径", icon='INFO')
+        elif settings.trace_mode == 'HOVER':
+            row = col.row()
+            row.prop(settings, "flow_direction", expand=True)
+            if utils.is_hover_trace_running():
+                col.operator("node.hover_trace", text="停止悬停追踪", icon='PAUSE')
+            else:
+                col.operator("node.hover_trace", text="开始悬停追踪", icon='PLAY')
+        elif settings.trace_mode == 'ACTIVE_SOCKET':
+            row = col.row()
+            row.prop(settings, "flow_direction", expand=True)
+            col.operator("node.pick_trace_socket", text="拾取接口", icon='EYEDROPPER')
+            if settings.trace_socket_node:
+                direction_text = "输出" if settings.trace_socket_is_output else "输入"
+                col.label(text=f"{settings.trace_socket_node} / {direction_text}: {settings.trace_socket_identifier}", icon='NODE')
+            else:
+                col.label(text="尚未拾取接口", icon='INFO')
         
         col.separator()
         
@@ -889,7 +1131,12 @@ class NODE_PT_colorful_connections_panel(bpy.types.Panel):
         col.prop(settings, "line_thickness")
         col.prop(settings, "node_border_thickness")
         col.prop(settings, "animation_speed")
+        col.prop(settings, "flow_style")
+        if settings.flow_style == 'PARTICLES':
+            col.prop(settings, "particles_per_link")
         col.prop(settings, "overall_opacity")
+        col.prop(settings, "cache_static_layers")
+        col.prop(settings, "merge_reroute_chains")
         
         col.separator()
         col.label(text="底层背景:")
@@ -919,113 +1166,188 @@ classes = [
     NODE_OT_save_settings_manual,
 ]
 
-# 场景加载后的回调函数
-@bpy.app.handlers.persistent
-def on_load_post(dummy):
-    """场景加载后，从插件目录重新加载设置"""
-    # 使用延迟执行，确保场景完全加载
-    def init_after_load():
+# --- 延迟加载配置 ---
+# 注册和打开文件时不再立即解析 JSON 并写入预设/颜色集合，
+# 而是在面板第一次绘制或连线叠加层第一次需要颜色时，通过定时器同步（绘制回调中不能写 ID 数据）
+# 已同步的场景会记录两个 JSON 文件的 (mtime, size)，文件未变化时跳过重新加载
+CONFIG_CHECK_INTERVAL = 1.0
+_config_state = {
+    'synced': {},         # 场景指针 -> 同步时的文件戳
+    'last_check': 0.0,
+    'pending': False,
+}
+
+def _get_config_stamps():
+    return (_get_file_stamp(get_preset_index_filepath()), _get_file_stamp(get_settings_filepath()))
+
+def _refresh_synced_stamps():
+    """保存文件后更新已同步场景的文件戳，避免把刚写入的内容再读回来"""
+    stamps = _get_config_stamps()
+    for key in _config_state['synced']:
+        _config_state['synced'][key] = stamps
+
+def mark_config_stale():
+    """标记所有场景需要重新同步（如打开新文件后）"""
+    _config_state['synced'].clear()
+    _config_state['last_check'] = 0.0
+
+def _get_active_scene():
+    scene = None
+    try:
+        scene = bpy.context.scene
+    except (AttributeError, RuntimeError):
+        pass
+    if not scene and bpy.data.scenes:
+        scene = bpy.data.scenes[0]
+    if not scene or not hasattr(scene, 'colorful_connections_settings'):
+        return None
+    return scene
+
+def request_config_sync(scene=None):
+    """
+    检查配置是否需要（重新）加载，需要时安排定时器执行同步
+    可在绘制回调中调用：本身只读，文件戳检查按 CONFIG_CHECK_INTERVAL 节流
+    """
+    # 后台写入期间文件戳会变化，写完后由 _poll_config_writes 刷新
+    if _config_state['pending'] or config_writer.is_busy():
+        return
+    if scene is None:
+        scene = _get_active_scene()
+        if scene is None:
+            return
+    key = scene.as_pointer()
+    if key in _config_state['synced']:
+        now = time.monotonic()
+        if now - _config_state['last_check'] < CONFIG_CHECK_INTERVAL:
+            return
+        _config_state['last_check'] = now
+        if _config_state['synced'][key] == _get_config_stamps():
+            return
+    _config_state['pending'] = True
+    bpy.app.timers.register(_sync_config_timer, first_interval=0.0)
+
+def _sync_config_timer():
+    _config_state['pending'] = False
+    try:
+        scene = _get_active_scene()
+        if scene is None:
+            return None
+        if config_writer.is_busy():
+            return None
+        stamps = _get_config_stamps()
+        key = scene.as_pointer()
+        if _config_state['synced'].get(key) == stamps:
+            return None
         try:
-            # 检查是否可以安全地访问场景
-            if not hasattr(bpy, 'data') or not hasattr(bpy.data, 'scenes'):
-                return None
-            
-            # 获取所有场景（使用 bpy.data.scenes 而不是 bpy.context.scene）
-            scenes = bpy.data.scenes
-            if not scenes:
-                return None
-            
-            # 遍历所有场景，但主要处理当前活动场景
-            scene = None
-            try:
-                # 尝试获取 context 中的场景（如果可用）
-                if hasattr(bpy, 'context') and hasattr(bpy.context, 'scene'):
-                    try:
-                        scene = bpy.context.scene
-                    except:
-                        pass
-            except:
-                pass
-            
-            # 如果无法从 context 获取，使用第一个场景
-            if not scene or not hasattr(scene, 'colorful_connections_settings'):
-                if scenes:
-                    scene = scenes[0]
-            
-            if not scene or not hasattr(scene, 'colorful_connections_settings'):
-                return None
-            
-            # 检查场景是否可写（避免在不安全上下文中修改）
-            try:
-                # 尝试只读访问来测试场景是否可用
-                _ = scene.name
-                settings = scene.colorful_connections_settings
-            except (AttributeError, RuntimeError, ReferenceError) as e:
-                print(f"场景不可访问: {e}")
-                return None
-            
-            # 从插件目录重新加载预设和设置（不从场景读取）
-            try:
-                load_presets_from_file(settings)
-            except Exception as e:
-                print(f"加载预设失败: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            try:
-                load_global_settings(settings)
-            except Exception as e:
-                print(f"加载全局设置失败: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            # 如果颜色为空，设置默认值（使用安全的方式）
-            try:
-                if len(settings.gradient_colors) == 0:
-                    # 设置颜色数量会触发 _update_color_count，此时在timer中是安全的
-                    settings.gradient_color_count = 5
-                    # 额外强制更新一次，以防之前的 update 被 AttributeErr 忽略
-                    settings._update_color_count()
-            except (AttributeError, RuntimeError, ReferenceError) as e:
-                print(f"设置gradient_color_count失败: {e}")
+            _ = scene.name
+            settings = scene.colorful_connections_settings
+        except (AttributeError, RuntimeError, ReferenceError) as e:
+            print(f"场景不可访问: {e}")
+            return None
+        start_time = time.perf_counter()
+        config_hash = get_config_hash()
+        _config_state['synced'][key] = stamps
+        if config_hash and settings.config_hash == config_hash:
+            # 磁盘上的配置与场景中已同步的内容相同，不触碰 RNA
+            utils.report_timing("检查配置（未变化）", start_time)
+            return None
+        _apply_config_to_settings(settings)
+        settings.config_hash = config_hash
+        utils.report_timing("加载配置", start_time)
+        _force_redraw_update()
+    except Exception as e:
+        print(f"初始化设置失败: {e}")
+        import traceback
+        traceback.print_exc()
+    return None  # timer 只执行一次
+
+def _apply_config_to_settings(settings):
+    """从插件目录加载预设和全局设置，并在颜色为空时填充默认值/应用预设"""
+    # 从插件目录加载预设（不从场景读取）
+    try:
+        load_presets_from_file(settings)
+    except Exception as e:
+        print(f"加载预设失败: {e}")
+        import traceback
+        traceback.print_exc()
+    
+    # 从插件目录加载全局设置（不从场景读取）
+    try:
+        load_global_settings(settings)
+    except Exception as e:
+        print(f"加载全局设置失败: {e}")
+        import traceback
+        traceback.print_exc()
+    
+    # 如果颜色为空，设置默认值
+    try:
+        if len(settings.gradient_colors) == 0:
+            settings.gradient_color_count = 5  # 这会触发 _update_color_count
+            settings._update_color_count() # 确保触发
+    except (AttributeError, RuntimeError, ReferenceError) as e:
+        print(f"设置gradient_color_count失败: {e}")
+    
+    # 如果Field颜色为空，设置默认值
+    try:
+        if len(settings.field_gradient_colors) == 0:
+            settings.field_gradient_color_count = 5  # 这会触发 _update_field_color_count
+            settings._update_field_color_count() # 确保触发
+    except (AttributeError, RuntimeError, ReferenceError) as e:
+        print(f"设置field_gradient_color_count失败: {e}")
+    
+    # 预设加载优先级：最后应用的 > 最后保存的 > 第一个 > 默认值
+    try:
+        if len(settings.gradient_presets) > 0:
+            preset_to_apply = None
+            preset_index_to_use = -1
             
-            try:
-                if len(settings.field_gradient_colors) == 0:
-                    settings.field_gradient_color_count = 5
-                    # 额外强制更新一次
-                    settings._update_field_color_count()
-            except (AttributeError, RuntimeError, ReferenceError) as e:
-                print(f"设置field_gradient_color_count失败: {e}")
+            # 优先级1：最后应用的预设
+            last_applied = getattr(settings, 'last_applied_preset_index', -1)
+            if last_applied >= 0 and last_applied < len(settings.gradient_presets):
+                preset_index_to_use = last_applied
+                preset_to_apply = settings.gradient_presets[last_applied]
+                settings.active_preset_index = last_applied  # 更新UI显示
+            # 优先级2：最后保存的预设（active_preset_index）
+            elif settings.active_preset_index >= 0 and settings.active_preset_index < len(settings.gradient_presets):
+                preset_index_to_use = settings.active_preset_index
+                preset_to_apply = settings.gradient_presets[settings.active_preset_index]
+                # active_preset_index 已经正确，无需更新
+            # 优先级3：第一个预设
+            else:
+                preset_index_to_use = 0
+                preset_to_apply = settings.gradient_presets[0]
+                settings.active_preset_index = 0
             
-            # 如果有预设，尝试应用（使用安全的方式）
-            try:
-                if len(settings.gradient_presets) > 0:
-                    preset_index = getattr(settings, 'last_applied_preset_index', -1)
-                    if preset_index < 0 or preset_index >= len(settings.gradient_presets):
-                        preset_index = 0
-                    
-                    if len(settings.gradient_colors) == 0 and preset_index < len(settings.gradient_presets):
-                        preset = settings.gradient_presets[preset_index]
-                        # 安全地清空和添加颜色
-                        settings.gradient_colors.clear()
-                        for preset_color in preset.colors:
-                            new_color = settings.gradient_colors.add()
-                            new_color.color = preset_color.color[:]
-                            new_color.alpha = getattr(preset_color, 'alpha', 1.0)
-                        settings.gradient_color_count = len(preset.colors)
-                        settings.active_preset_index = preset_index
-            except (AttributeError, RuntimeError, ReferenceError) as e:
-                print(f"应用预设失败: {e}")
-        except Exception as e:
-            print(f"加载后初始化失败: {e}")
-            import traceback
-            traceback.print_exc()
-        return None  # timer 只执行一次
-    
-    # 延迟0.5秒执行，确保场景完全加载
-    bpy.app.timers.register(init_after_load, first_interval=0.5)
+            # 如果找到有效的预设，且当前颜色为空，则应用它
+            if preset_to_apply and len(settings.gradient_colors) == 0 and ensure_preset_colors(preset_to_apply):
+                try:
+                    # 应用预设颜色
+                    settings.gradient_colors.clear()
+                    for preset_color in preset_to_apply.colors:
+                        new_color = settings.gradient_colors.add()
+                        new_color.color = preset_color.color[:]
+                        new_color.alpha = getattr(preset_color, 'alpha', 1.0)
+                    settings.gradient_color_count = len(preset_to_apply.colors)
+                    settings.active_preset_index = preset_index_to_use
+                    settings.last_applied_preset_index = preset_index_to_use
+                    print(f"已自动应用预设: {preset_to_apply.name} (索引: {preset_index_to_use})")
+                except Exception as e:
+                    print(f"自动应用预设失败: {e}")
+                    import traceback
+                    traceback.print_exc()
+    except (AttributeError, RuntimeError, ReferenceError) as e:
+        print(f"处理预设失败: {e}")
+
+# 场景加载后的回调函数
+@bpy.app.handlers.persistent
+def on_load_post(dummy):
+    """场景加载后只标记配置需要同步，实际加载推迟到面板或连线绘制时"""
+    mark_config_stale()
+    # 加载文件会移除正在运行的悬停追踪操作符
+    utils.stop_hover_trace()
 
 def register():
+    start_time = time.perf_counter()
     for cls in classes:
         bpy.utils.register_class(cls)
     
@@ -1035,110 +1357,23 @@ def register():
     if on_load_post not in bpy.app.handlers.load_post:
         bpy.app.handlers.load_post.append(on_load_post)
     
-    # 初始化默认颜色和加载设置（插件启用时）
-    def init_default_colors():
-        try:
-            # 安全地获取场景
-            scene = None
-            try:
-                if hasattr(bpy, 'context') and hasattr(bpy.context, 'scene'):
-                    scene = bpy.context.scene
-            except:
-                # 如果 context 不可用，尝试从 bpy.data.scenes 获取
-                if hasattr(bpy, 'data') and hasattr(bpy.data, 'scenes') and bpy.data.scenes:
-                    scene = bpy.data.scenes[0]
-            
-            if not scene or not hasattr(scene, 'colorful_connections_settings'):
-                return
-            
-            try:
-                settings = scene.colorful_connections_settings
-            except (AttributeError, RuntimeError, ReferenceError):
-                return
-            
-            # 从插件目录加载预设（不从场景读取）
-            try:
-                load_presets_from_file(settings)
-            except Exception as e:
-                print(f"加载预设失败: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            # 从插件目录加载全局设置（不从场景读取）
-            try:
-                load_global_settings(settings)
-            except Exception as e:
-                print(f"加载全局设置失败: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            # 如果颜色为空，设置默认值
-            try:
-                if len(settings.gradient_colors) == 0:
-                    settings.gradient_color_count = 5  # 这会触发 _update_color_count
-                    settings._update_color_count() # 确保触发
-            except (AttributeError, RuntimeError, ReferenceError) as e:
-                print(f"设置gradient_color_count失败: {e}")
-            
-            # 如果Field颜色为空，设置默认值
-            try:
-                if len(settings.field_gradient_colors) == 0:
-                    settings.field_gradient_color_count = 5  # 这会触发 _update_field_color_count
-                    settings._update_field_color_count() # 确保触发
-            except (AttributeError, RuntimeError, ReferenceError) as e:
-                print(f"设置field_gradient_color_count失败: {e}")
-            
-            # 预设加载优先级：最后应用的 > 最后保存的 > 第一个 > 默认值
-            try:
-                if len(settings.gradient_presets) > 0:
-                    preset_to_apply = None
-                    preset_index_to_use = -1
-                    
-                    # 优先级1：最后应用的预设
-                    last_applied = getattr(settings, 'last_applied_preset_index', -1)
-                    if last_applied >= 0 and last_applied < len(settings.gradient_presets):
-                        preset_index_to_use = last_applied
-                        preset_to_apply = settings.gradient_presets[last_applied]
-                        settings.active_preset_index = last_applied  # 更新UI显示
-                    # 优先级2：最后保存的预设（active_preset_index）
-                    elif settings.active_preset_index >= 0 and settings.active_preset_index < len(settings.gradient_presets):
-                        preset_index_to_use = settings.active_preset_index
-                        preset_to_apply = settings.gradient_presets[settings.active_preset_index]
-                        # active_preset_index 已经正确，无需更新
-                    # 优先级3：第一个预设
-                    else:
-                        preset_index_to_use = 0
-                        preset_to_apply = settings.gradient_presets[0]
-                        settings.active_preset_index = 0
-                    
-                    # 如果找到有效的预设，且当前颜色为空，则应用它
-                    if preset_to_apply and len(settings.gradient_colors) == 0:
-                        try:
-                            # 应用预设颜色
-                            settings.gradient_colors.clear()
-                            for preset_color in preset_to_apply.colors:
-                                new_color = settings.gradient_colors.add()
-                                new_color.color = preset_color.color[:]
-                                new_color.alpha = getattr(preset_color, 'alpha', 1.0)
-                            settings.gradient_color_count = len(preset_to_apply.colors)
-                            settings.active_preset_index = preset_index_to_use
-                            settings.last_applied_preset_index = preset_index_to_use
-                            print(f"已自动应用预设: {preset_to_apply.name} (索引: {preset_index_to_use})")
-                        except Exception as e:
-                            print(f"自动应用预设失败: {e}")
-                            import traceback
-                            traceback.print_exc()
-            except (AttributeError, RuntimeError, ReferenceError) as e:
-                print(f"处理预设失败: {e}")
-        except Exception as e:
-            print(f"初始化设置失败: {e}")
-            import traceback
-            traceback.print_exc()
-    
-    # 延迟初始化
-    bpy.app.timers.register(init_default_colors, first_interval=0.1)
+    # 配置在第一次需要时再加载
+    mark_config_stale()
+    utils.set_config_sync_callback(request_config_sync)
+    utils.report_timing("注册面板", start_time)
 
 def unregister():
+    utils.set_config_sync_callback(None)
+    # 确保未完成的配置写入落盘，然后结束后台写入线程
+    config_writer.flush()
+    config_writer.stop()
+    if bpy.app.timers.is_registered(_poll_config_writes):
+        bpy.app.timers.unregister(_poll_config_writes)
+    if bpy.app.timers.is_registered(_sync_config_timer):
+        bpy.app.timers.unregister(_sync_config_timer)
+    _config_state['pending'] = False
+    mark_config_stale()
+    
     # 移除场景加载后的回调
     if on_load_post in bpy.app.handlers.load_post:
         bpy.app.handlers.load_post.remove(on_load_post)
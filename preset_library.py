@@ -0,0 +1,116 @@
+"""
+预设库：一个目录 + 紧凑的索引文件
+
+    library/
+        index.json      -> [{"key", "name", "count", "hash"}, ...]（只含元数据）
+        <key>.json      -> {"name", "colors": [{"color": [r, g, b], "alpha": a}, ...]}
+
+加载预设列表时只读取索引；预设的颜色在应用/预览时才按 key 读取。
+保存/删除预设只写入对应的预设文件和索引，不重写整个库（写入由 config_writer 在后台完成）。
+"""
+
+import json
+import os
+import hashlib
+import uuid
+from . import config_writer
+
+INDEX_FILENAME = 'index.json'
+# 计算内容哈希时使用的紧凑 JSON 格式
+_JSON_SEPARATORS = (',', ':')
+
+# 预设颜色缓存：key -> (内容哈希, 颜色列表)
+_colors_cache = {}
+
+def get_index_path(library_dir):
+    return os.path.join(library_dir, INDEX_FILENAME)
+
+def _get_entry_path(library_dir, key):
+    return os.path.join(library_dir, f"{key}.json")
+
+def _write_json(filepath, data, message=None):
+    """提交到后台写入（临时文件 + 原子替换，连续保存会合并），message 在写入成功后输出"""
+    config_writer.submit(filepath, data, message)
+
+def normalize_colors(colors):
+    """统一颜色数据格式：[{'color': [r, g, b], 'alpha': a}, ...]"""
+    result = []
+    for color_data in colors:
+        color_rgb = color_data.get('color', [1.0, 1.0, 1.0])
+        result.append({
+            'color': [float(color_rgb[0]), float(color_rgb[1]), float(color_rgb[2])],
+            'alpha': float(color_data.get('alpha', 1.0)),
+        })
+    return result
+
+def compute_colors_hash(colors):
+    payload = json.dumps(colors, separators=_JSON_SEPARATORS, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def new_preset_key():
+    return uuid.uuid4().hex[:16]
+
+def save_index(library_dir, entries):
+    _write_json(get_index_path(library_dir), [
+        {'key': e['key'], 'name': e['name'], 'count': e['count'], 'hash': e['hash']}
+        for e in entries
+    ])
+
+def load_preset_colors(library_dir, key, content_hash=''):
+    """按 key 读取预设颜色（已缓存且哈希一致时不读文件）"""
+    cached = _colors_cache.get(key)
+    if cached is not None and (not content_hash or cached[0] == content_hash):
+        return cached[1]
+    with open(_get_entry_path(library_dir, key), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    colors = normalize_colors(data.get('colors', []))
+    _colors_cache[key] = (compute_colors_hash(colors), colors)
+    return colors
+
+def save_preset(library_dir, entries, key, name, colors):
+    """写入单个预设文件并更新索引（entries 会被原地修改），返回该预设的索引条目"""
+    colors = normalize_colors(colors)
+    content_hash = compute_colors_hash(colors)
+    entry_path = _get_entry_path(library_dir, key)
+    _write_json(entry_path, {'name': name, 'colors': colors}, f"预设已保存到: {entry_path}")
+    _colors_cache[key] = (content_hash, colors)
+
+    entry = {'key': key, 'name': name, 'count': len(colors), 'hash': content_hash}
+    for i, existing in enumerate(entries):
+        if existing['key'] == key:
+            entries[i] = entry
+            break
+    else:
+        entries.append(entry)
+    save_index(library_dir, entries)
+    return entry
+
+def delete_preset(library_dir, entries, key):
+    """删除单个预设文件并更新索引（entries 会被原地修改）"""
+    entries[:] = [e for e in entries if e['key'] != key]
+    _colors_cache.pop(key, None)
+    config_writer.submit_remove(_get_entry_path(library_dir, key))
+    save_index(library_dir, entries)
+
+def migrate_legacy_presets(library_dir, legacy_filepath):
+    """把旧的 gradient_presets.json（单个数组）拆分到预设库中，返回新索引；没有旧文件时返回空列表"""
+    entries = []
+    if os.path.exists(legacy_filepath):
+        with open(legacy_filepath, 'r', encoding='utf-8') as f:
+            presets_data = json.load(f) or []
+        for preset_data in presets_data:
+            colors = normalize_colors(preset_data.get('colors', []))
+            key = new_preset_key()
+            content_hash = compute_colors_hash(colors)
+            _write_json(_get_entry_path(library_dir, key), {
+                'name': preset_data.get('name', '新预设'),
+                'colors': colors,
+            })
+            entries.append({
+                'key': key,
+                'name': preset_data.get('name', '新预设'),
+                'count': len(colors),
+                'hash': content_hash,
+            })
+    save_index(library_dir, entries)
+    return entries
@@ -0,0 +1,97 @@
+"""
+预设渐变缩略图
+
+缩略图按预设内容哈希生成 PNG 并缓存在预设库的 thumbs 目录，
+再通过 bpy.utils.previews 加载；同一哈希只生成一次，面板重绘时只查字典。
+"""
+
+import bpy
+import bpy.utils.previews
+import os
+import struct
+import zlib
+import numpy as np
+from . import preset_library
+
+PREVIEW_SIZE = 64
+# 透明部分用棋盘格衬底显示
+_CHECKER_SIZE = 8
+_CHECKER_COLORS = (0.35, 0.55)
+
+_preview_state = {
+    'collection': None,
+    'failed': set(),   # 生成失败的哈希，避免每次重绘重复尝试
+}
+
+def _get_thumbs_dir(library_dir):
+    return os.path.join(library_dir, 'thumbs')
+
+def _render_swatch(colors, size=PREVIEW_SIZE):
+    """按颜色顺序生成水平渐变（含透明度，叠加在棋盘格上），返回 (size, size, 3) 的 uint8 数组"""
+    rgba = np.array([c['color'] + [c['alpha']] for c in colors], dtype=np.float64)
+    if len(rgba) == 1:
+        rgba = np.repeat(rgba, 2, axis=0)
+    x = np.linspace(0.0, len(rgba) - 1, size)
+    index = np.minimum(x.astype(np.int64), len(rgba) - 2)
+    t = (x - index)[:, None]
+    row = rgba[index] * (1.0 - t) + rgba[index + 1] * t
+
+    yy, xx = np.mgrid[0:size, 0:size]
+    checker = np.where(((xx // _CHECKER_SIZE) + (yy // _CHECKER_SIZE)) % 2 == 0, *_CHECKER_COLORS)
+    alpha = row[None, :, 3]
+    pixels = row[None, :, :3] * alpha[..., None] + checker[..., None] * (1.0 - alpha[..., None])
+    # 颜色为线性空间，转换到 sRGB 保存
+    pixels = np.where(pixels <= 0.0031308, pixels * 12.92, 1.055 * np.power(np.clip(pixels, 0.0, 1.0), 1.0 / 2.4) - 0.055)
+    return np.rint(np.clip(pixels, 0.0, 1.0) * 255.0).astype(np.uint8)
+
+def _write_png(filepath, pixels):
+    """写入 8 位 RGB PNG（纯 Python，不依赖图像库）"""
+    height, width = pixels.shape[:2]
+    # PNG 行序从上到下；每行前加过滤字节 0
+    raw = b''.join(b'\x00' + pixels[y].tobytes() for y in range(height))
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    png = b'\x89PNG\r\n\x1a\n'
+    png += chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+    png += chunk(b'IDAT', zlib.compress(raw, 9))
+    png += chunk(b'IEND', b'')
+    temp_path = filepath + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(png)
+    os.replace(temp_path, filepath)
+
+def get_preset_icon_id(library_dir, key, content_hash):
+    """返回预设缩略图的 icon_id，无法生成时返回 0"""
+    pcoll = _preview_state['collection']
+    if pcoll is None or not key or not content_hash or content_hash in _preview_state['failed']:
+        return 0
+    preview = pcoll.get(content_hash)
+    if preview is not None:
+        return preview.icon_id
+    try:
+        thumbs_dir = _get_thumbs_dir(library_dir)
+        filepath = os.path.join(thumbs_dir, f"{content_hash}.png")
+        if not os.path.exists(filepath):
+            colors = preset_library.load_preset_colors(library_dir, key, content_hash)
+            if not colors:
+                return 0
+            os.makedirs(thumbs_dir, exist_ok=True)
+            _write_png(filepath, _render_swatch(colors))
+        preview = pcoll.load(content_hash, filepath, 'IMAGE')
+    except Exception as e:
+        print(f"生成预设缩略图失败: {e}")
+        _preview_state['failed'].add(content_hash)
+        return 0
+    return preview.icon_id
+
+def register():
+    if _preview_state['collection'] is None:
+        _preview_state['collection'] = bpy.utils.previews.new()
+
+def unregister():
+    if _preview_state['collection'] is not None:
+        bpy.utils.previews.remove(_preview_state['collection'])
+        _preview_state['collection'] = None
+    _preview_state['failed'].clear()
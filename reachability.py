@@ -0,0 +1,156 @@
+"""
+节点级可达性索引（悬停追踪、两节点间路径用）
+
+鼠标移动时每次都做一次图遍历不够流畅。这里按拓扑版本对邻接索引预计算：
+- 强连通分量（区域的虚拟边会形成环）缩点后按拓扑顺序排列，上下游各一份
+- 每个分量向下游/上游可达的全部连线，用 Python 整数作为位集保存
+
+查询时只需取出分量的位集；位集解码为连线集合的结果再按 (节点, 方向) 缓存。
+结果存放在邻接索引中，拓扑变化时随索引一起失效，下次查询时重建。
+静音节点按进入接口拆分为多个状态，只沿内部连线继续（与活动节点流一致）；
+节点组流摘要等其余接口级信息不参与。
+"""
+
+from . import flow_index
+
+def _strongly_connected_components(node_ptrs, chains):
+    """迭代版 Tarjan 算法，返回分量列表（逆拓扑顺序：下游的分量在前）"""
+    index_of = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+    for root in node_ptrs:
+        if root in index_of:
+            continue
+        index_of[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(chains.get(root, ())))]
+        while work:
+            ptr, edges = work[-1]
+            advanced = False
+            for _, end_ptr in edges:
+                if end_ptr is None:
+                    continue
+                if end_ptr not in index_of:
+                    index_of[end_ptr] = lowlink[end_ptr] = counter
+                    counter += 1
+                    stack.append(end_ptr)
+                    on_stack.add(end_ptr)
+                    work.append((end_ptr, iter(chains.get(end_ptr, ()))))
+                    advanced = True
+                    break
+                if end_ptr in on_stack:
+                    lowlink[ptr] = min(lowlink[ptr], index_of[end_ptr])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[ptr])
+            if lowlink[ptr] == index_of[ptr]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == ptr:
+                        break
+                components.append(component)
+    return components
+
+def _close_over(components, component_of, chains, link_bit):
+    """按给定顺序（后继分量在前）累积每个分量可达的连线位集"""
+    closures = [0] * len(components)
+    for comp_id, members in enumerate(components):
+        bits = 0
+        for ptr in members:
+            for edge_links, end_ptr in chains.get(ptr, ()):
+                for link in edge_links:
+                    bits |= link_bit[link]
+                if end_ptr is not None:
+                    next_id = component_of[end_ptr]
+                    if next_id != comp_id:
+                        bits |= closures[next_id]
+        closures[comp_id] = bits
+    return closures
+
+def _build_closures(node_ptrs, chains, link_bit):
+    """
+    逆拓扑顺序（后继分量在前）正好先算出后继的闭包；上下游各自按自己的邻接求分量
+    """
+    components = _strongly_connected_components(node_ptrs, chains)
+    component_of = {}
+    for comp_id, members in enumerate(components):
+        for ptr in members:
+            component_of[ptr] = comp_id
+    return component_of, _close_over(components, component_of, chains, link_bit)
+
+def build_reachability(index):
+    nodes = list(index['nodes'])
+    # 逐条连线的邻接（Reroute 作为普通节点，静音节点按接口拆分），每条连线只出现一次
+    graph_out = flow_index.get_link_graph(index, 'forward')
+    graph_in = flow_index.get_link_graph(index, 'backward')
+    links = []
+    link_bit = {}
+    for chains in (graph_out, graph_in):
+        for edges in chains.values():
+            for edge_links, _ in edges:
+                for link in edge_links:
+                    if link not in link_bit:
+                        link_bit[link] = 1 << len(links)
+                        links.append(link)
+    return {
+        'links': links,
+        'forward': _build_closures(nodes, graph_out, link_bit),
+        'backward': _build_closures(nodes, graph_in, link_bit),
+        'decoded': {},
+    }
+
+def get_reachability(index):
+    """按需建立并存入邻接索引（索引按拓扑版本缓存，因此可达性也随之失效）"""
+    reach = index.get('reachability')
+    if reach is None:
+        reach = build_reachability(index)
+        index['reachability'] = reach
+    return reach
+
+def _decode_links(bits, links):
+    result = set()
+    while bits:
+        low = bits & -bits
+        result.add(links[low.bit_length() - 1])
+        bits ^= low
+    return result
+
+def collect_reachable_links(reach, node_ptr, direction):
+    """节点向下游（'forward'）或上游（'backward'）可达的全部连线"""
+    key = (node_ptr, direction)
+    decoded = reach['decoded'].get(key)
+    if decoded is None:
+        component_of, closures = reach[direction]
+        comp_id = component_of.get(node_ptr)
+        bits = closures[comp_id] if comp_id is not None else 0
+        decoded = frozenset(_decode_links(bits, reach['links']))
+        reach['decoded'][key] = decoded
+    return decoded
+
+def collect_path_links(reach, from_ptr, to_ptr):
+    """
+    from 到 to 的所有路径上的连线：from 下游可达的连线与 to 上游可达的连线的交集，
+    连线起点从 from 可达、终点可达 to，恰好是某条路径上的连线
+    """
+    key = (from_ptr, to_ptr, 'path')
+    decoded = reach['decoded'].get(key)
+    if decoded is None:
+        bits = -1
+        for ptr, direction in ((from_ptr, 'forward'), (to_ptr, 'backward')):
+            component_of, closures = reach[direction]
+            comp_id = component_of.get(ptr)
+            bits &= closures[comp_id] if comp_id is not None else 0
+        decoded = frozenset(_decode_links(bits, reach['links']))
+        reach['decoded'][key] = decoded
+    return decoded
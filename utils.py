@@ -1,6 +1,5 @@
 import bpy
 import gpu
-from gpu_extras.batch import batch_for_shader
 from math import isfinite
 import time
 from mathutils import Vector
@@ -8,6 +7,11 @@ import colorsys
 from ctypes import c_void_p, c_float
 from math import pi, sqrt, exp, hypot, sin, cos
 import re
+import numpy as np
+from gpu_extras.batch import batch_for_shader
+from . import change_tracker
+from . import flow_index
+from . import reachability
 
 # Socket类型到色相偏移的映射（基于HSV色相，范围0-360度）
 SOCKET_TYPE_HUE_OFFSETS = {
@@ -82,57 +86,63 @@ def shift_hue(rgb, hue_offset):
     
     return (r_new, g_new, b_new, alpha)
 
-def get_socket_hue_offset(socket):
-    """获取socket类型的色相偏移值"""
-    socket_type = get_socket_type_name(socket)
-    return SOCKET_TYPE_HUE_OFFSETS.get(socket_type, 0.0)
+# Socket类型到端点圆圈大小系数的映射（不同数据类型使用不同的显示尺寸，避免全是小圆点）
+SOCKET_TYPE_SIZE_MULTIPLIERS = {
+    'NodeSocketFloat': 1.0,      # 标准大小
+    'NodeSocketInt': 1.1,        # 略大
+    'NodeSocketVector': 1.15,    # 更大
+    'NodeSocketColor': 1.2,      # 更大
+    'NodeSocketShader': 1.25,    # 最大
+    'NodeSocketBool': 0.9,       # 略小
+    'NodeSocketString': 1.1,
+    'NodeSocketObject': 1.15,
+    'NodeSocketImage': 1.2,
+    'NodeSocketGeometry': 1.25,
+    'NodeSocketCollection': 1.1,
+    'NodeSocketTexture': 1.2,
+    'NodeSocketMaterial': 1.2,
+    'NodeSocketRotation': 1.15,
+    'NodeSocketMatrix': 1.25,
+}
+
+# 端点样式查找表：(socket类型, 是否Field, 是否终点) -> (RGBA, 未缩放半径)
+# socket类型为 None 的条目用于未登记的类型
+_endpoint_style_state = {
+    'key': None,
+    'table': {},
+}
 
-def get_socket_circle_size(socket, zoom, base_size=5.0):
+def _socket_style_tables_hash():
     """
-    根据socket类型返回圆圈大小
-    不同数据类型使用不同的显示尺寸，避免全是小圆点
+    色相偏移表与半径倍数表的哈希（两张表可在运行时修改，不经过设置，
+    因此不在设置版本号中，需要单独加入缓存键）
     """
-    socket_type = get_socket_type_name(socket)
-    # 根据socket类型分配不同的大小系数
-    size_multipliers = {
-        'NodeSocketFloat': 1.0,      # 标准大小
-        'NodeSocketInt': 1.1,        # 略大
-        'NodeSocketVector': 1.15,    # 更大
-        'NodeSocketColor': 1.2,      # 更大
-        'NodeSocketShader': 1.25,    # 最大
-        'NodeSocketBool': 0.9,       # 略小
-        'NodeSocketString': 1.1,
-        'NodeSocketObject': 1.15,
-        'NodeSocketImage': 1.2,
-        'NodeSocketGeometry': 1.25,
-        'NodeSocketCollection': 1.1,
-        'NodeSocketTexture': 1.2,
-        'NodeSocketMaterial': 1.2,
-        'NodeSocketRotation': 1.15,
-        'NodeSocketMatrix': 1.25,
-    }
-    multiplier = size_multipliers.get(socket_type, 1.0)
-    return base_size * multiplier * zoom
+    return hash((tuple(SOCKET_TYPE_HUE_OFFSETS.items()), tuple(SOCKET_TYPE_SIZE_MULTIPLIERS.items())))
 
-def apply_type_based_color_shift(colors, from_socket, to_socket, offset_strength=0.4):
+def get_endpoint_style_table(grad_cols, field_grad_cols, version, base_size=5.0):
     """
-    根据socket类型对颜色进行色相偏移
-    offset_strength: 偏移强度（0-1），0.4表示偏移40%的强度，避免颜色变化过大
+    获取按数据类型着色时端点圆圈的颜色/半径查找表
+    仅在调色板或 SOCKET_TYPE_HUE_OFFSETS 变化时重建，避免每帧做 RGB/HSV 转换
+    version 为设置的版本号（change_tracker），与样式表的哈希一起用作缓存键
     """
-    # 使用目标socket的类型（因为数据流向目标）
-    target_socket = to_socket
-    hue_offset = get_socket_hue_offset(target_socket)
-    
-    # 应用强度系数
-    effective_offset = hue_offset * offset_strength
-    
-    # 对所有颜色应用偏移
-    shifted_colors = []
-    for color in colors:
-        shifted = shift_hue(color, effective_offset)
-        shifted_colors.append(shifted)
-    
-    return shifted_colors
+    key = (version, _socket_style_tables_hash(), base_size)
+    if _endpoint_style_state['key'] == key:
+        return _endpoint_style_state['table']
+    
+    table = {}
+    socket_types = [None, *SOCKET_TYPE_HUE_OFFSETS, *SOCKET_TYPE_SIZE_MULTIPLIERS]
+    for socket_type in socket_types:
+        effective_offset = SOCKET_TYPE_HUE_OFFSETS.get(socket_type, 0.0) * 0.5
+        radius = base_size * SOCKET_TYPE_SIZE_MULTIPLIERS.get(socket_type, 1.0)
+        for is_field, cols in ((False, grad_cols), (True, field_grad_cols)):
+            start = cols[0] if cols else (1, 1, 1, 1)
+            end = cols[-1] if cols else (1, 1, 1, 1)
+            table[(socket_type, is_field, False)] = (shift_hue(start, effective_offset), radius)
+            table[(socket_type, is_field, True)] = (shift_hue(end, effective_offset), radius)
+    
+    _endpoint_style_state['key'] = key
+    _endpoint_style_state['table'] = table
+    return table
 
 def is_field_link(tree, link):
     """
@@ -530,6 +540,7 @@ _SHADER_CACHE = {}
 _locked_flow_data = {
     'links': set(),
     'nodes': set(),
+    'hops': None,
     'is_locked': False
 }
 
@@ -539,11 +550,14 @@ def get_shader(name):
     
     info = gpu.types.GPUShaderCreateInfo()
     info.push_constant('MAT4', 'ModelViewProjectionMatrix')
+    # 顶点位置以 16 位整数存储，相对于每个批次的原点，按 u_pos_scale 还原为像素坐标
+    info.push_constant('VEC2', 'u_origin')
+    info.push_constant('FLOAT', 'u_pos_scale')
     
     # --- 公共 Vertex Source ---
     vert_src = '''
         void main() {
-            gl_Position = ModelViewProjectionMatrix * vec4(pos, 0.0, 1.0);
+            gl_Position = ModelViewProjectionMatrix * vec4(u_origin + pos * u_pos_scale, 0.0, 1.0);
             v_uv = uv;
         }
     '''
@@ -594,43 +608,41 @@ def get_shader(name):
             }
         ''')
 
-    # --- 动态颜色渐变 Shader (支持最多10个颜色) ---
+    # --- 动态颜色渐变 Shader（颜色从调色板纹理中读取，颜色数量不限） ---
     elif name == 'GRADIENT':
         iface = gpu.types.GPUStageInterfaceInfo("node_wrangler_gradient_iface")
         iface.smooth('VEC2', 'v_uv')
+        iface.flat('INT', 'v_pal')
+        iface.flat('FLOAT', 'v_hop')
         info.vertex_in(0, 'VEC2', 'pos')
         info.vertex_in(1, 'VEC2', 'uv')
+        info.vertex_in(2, 'INT', 'pal')  # 调色板纹理中的行号
+        info.vertex_in(3, 'INT', 'hop')  # 距活动节点的层号（广度优先遍历的层）
         info.vertex_out(iface)
         info.push_constant('FLOAT', 'u_time')
         info.push_constant('FLOAT', 'u_alpha')
-        info.push_constant('INT', 'u_color_count')  # 实际使用的颜色数量
-        
-        # 接收最多10个颜色
-        for i in range(10):
-            info.push_constant('VEC4', f'color{i+1}')
-        
+        # 按层号淡化：u_hop_scale 为 1/淡化层数，为 0 时关闭；u_hop_min_alpha 为最远处的透明度系数
+        info.push_constant('FLOAT', 'u_hop_scale')
+        info.push_constant('FLOAT', 'u_hop_min_alpha')
+        # 每行：第0列存颜色数量，之后依次为各颜色（RGBA）
+        info.sampler(0, 'FLOAT_2D', 'palette_tex')
         info.fragment_out(0, 'VEC4', 'fragColor')
-        info.vertex_source(vert_src)
+        info.vertex_source('''
+            void main() {
+                gl_Position = ModelViewProjectionMatrix * vec4(u_origin + pos * u_pos_scale, 0.0, 1.0);
+                v_uv = uv;
+                v_pal = pal;
+                v_hop = float(hop);
+            }
+        ''')
         
         info.fragment_source('''
             void main() {
                 float v_progress = v_uv.x;
                 float v_side = v_uv.y;
                 float t = u_time * 0.5;
-                
-                // 构建颜色数组（包含RGB和Alpha）
-                vec3 colors[10];
-                float alphas[10];
-                colors[0] = color1.rgb; alphas[0] = color1.a;
-                colors[1] = color2.rgb; alphas[1] = color2.a;
-                colors[2] = color3.rgb; alphas[2] = color3.a;
-                colors[3] = color4.rgb; alphas[3] = color4.a;
-                colors[4] = color5.rgb; alphas[4] = color5.a;
-                colors[5] = color6.rgb; alphas[5] = color6.a;
-                colors[6] = color7.rgb; alphas[6] = color7.a;
-                colors[7] = color8.rgb; alphas[7] = color8.a;
-                colors[8] = color9.rgb; alphas[8] = color9.a;
-                colors[9] = color10.rgb; alphas[9] = color10.a;
+                float hop_on = step(1e-6, u_hop_scale);
+                float hop_t = clamp(v_hop * u_hop_scale, 0.0, 1.0);
                 
                 // 计算流动相位
                 float flow_speed = 0.5;
@@ -638,20 +650,22 @@ def get_shader(name):
                 phase = fract(phase);
                 
                 // 动态颜色混合
-                float n = float(u_color_count);
+                int color_count = max(1, int(texelFetch(palette_tex, ivec2(0, v_pal), 0).r));
+                float n = float(color_count);
                 float pos = phase * n;
                 int index = int(floor(pos));
                 float f = fract(pos);
                 
                 // 确保索引在有效范围内
-                index = min(index, u_color_count - 1);
-                int next_index = (index + 1) % u_color_count;
+                index = min(index, color_count - 1);
+                int next_index = (index + 1) % color_count;
                 
-                // 混合RGB
-                vec3 final_base_rgb = mix(colors[index], colors[next_index], f);
+                vec4 color_a = texelFetch(palette_tex, ivec2(1 + index, v_pal), 0);
+                vec4 color_b = texelFetch(palette_tex, ivec2(1 + next_index, v_pal), 0);
                 
-                // 混合Alpha（每个颜色的独立透明度）
-                float final_base_alpha = mix(alphas[index], alphas[next_index], f);
+                // 混合RGB与每个颜色的独立透明度
+                vec3 final_base_rgb = mix(color_a.rgb, color_b.rgb, f);
+                float final_base_alpha = mix(color_a.a, color_b.a, f);
                 
                 // 脉冲效果
                 float pulse_t = u_time * 1.0;
@@ -672,8 +686,11 @@ def get_shader(name):
                 float dist = abs(v_side);
                 float alpha_edge = 1.0 - smoothstep(0.85, 1.0, dist);
                 
-                // 最终alpha = 颜色自身alpha * 全局透明度 * 边缘衰减
-                float final_alpha = final_base_alpha * u_alpha * alpha_edge;
+                // 远处的连线变淡
+                float hop_alpha = mix(1.0, u_hop_min_alpha, hop_t * hop_on);
+                
+                // 最终alpha = 颜色自身alpha * 全局透明度 * 边缘衰减 * 距离淡化
+                float final_alpha = final_base_alpha * u_alpha * alpha_edge * hop_alpha;
                 fragColor = vec4(final_rgb, final_alpha);
             }
         ''')
@@ -702,17 +719,74 @@ def get_shader(name):
         info.vertex_in(1, 'VEC2', 'uv')
         info.vertex_out(iface)
         info.push_constant('VEC4', 'color')
+        info.push_constant('FLOAT', 'u_uv_scale')  # 归一化UV还原到实际的圆外扩比例
         info.fragment_out(0, 'VEC4', 'fragColor')
         info.vertex_source(vert_src)
         info.fragment_source('''
             void main() {
-                float dist = length(v_uv);
+                float dist = length(v_uv * u_uv_scale);
                 float delta = 1.5 * fwidth(dist);
                 float alpha = 1.0 - smoothstep(1.0 - delta, 1.0, dist);
                 fragColor = vec4(color.rgb, color.a * alpha);
             }
         ''')
 
+    # --- 流动粒子：粒子位置完全在GPU上由连线控制点和时间计算 ---
+    elif name == 'FLOW_PARTICLE':
+        iface = gpu.types.GPUStageInterfaceInfo("node_wrangler_flow_particle_iface")
+        iface.smooth('VEC2', 'v_uv')
+        iface.smooth('FLOAT', 'v_progress')
+        iface.flat('INT', 'v_pal')
+        info.vertex_in(0, 'VEC4', 'ctrl_a')   # p0.xy, p1.xy（View2D 坐标）
+        info.vertex_in(1, 'VEC4', 'ctrl_b')   # p2.xy, p3.xy
+        info.vertex_in(2, 'VEC2', 'corner')   # 四边形角点 (-1..1)
+        info.vertex_in(3, 'INT', 'pal')
+        info.vertex_out(iface)
+        info.push_constant('VEC2', 'u_view_scale')   # View2D -> Region 的仿射变换
+        info.push_constant('VEC2', 'u_view_offset')
+        info.push_constant('FLOAT', 'u_time')
+        info.push_constant('FLOAT', 'u_alpha')
+        info.push_constant('FLOAT', 'u_radius')
+        info.push_constant('INT', 'u_particle_count')  # 每条连线的粒子数（实例数）
+        info.sampler(0, 'FLOAT_2D', 'palette_tex')
+        info.fragment_out(0, 'VEC4', 'fragColor')
+        info.vertex_source('''
+            void main() {
+                // 每个实例是同一条连线上的一个粒子，初始相位在连线上均匀分布
+                float phase = float(gl_InstanceID) / float(max(1, u_particle_count));
+                // 与渐变流动同速：渐变相位为 u_time * 0.25 - progress
+                float t = fract(phase + u_time * 0.25);
+                float it = 1.0 - t;
+                vec2 p = it * it * it * ctrl_a.xy
+                       + 3.0 * it * it * t * ctrl_a.zw
+                       + 3.0 * it * t * t * ctrl_b.xy
+                       + t * t * t * ctrl_b.zw;
+                vec2 center = p * u_view_scale + u_view_offset;
+                // 外扩2像素用于抗锯齿
+                vec2 region_pos = center + corner * (u_radius + 2.0);
+                gl_Position = ModelViewProjectionMatrix * vec4(region_pos, 0.0, 1.0);
+                v_uv = corner * ((u_radius + 2.0) / u_radius);
+                v_progress = t;
+                v_pal = pal;
+            }
+        ''')
+        info.fragment_source('''
+            void main() {
+                int color_count = max(1, int(texelFetch(palette_tex, ivec2(0, v_pal), 0).r));
+                float pos = fract(u_time * 0.25 - v_progress) * float(color_count);
+                int index = min(int(floor(pos)), color_count - 1);
+                int next_index = (index + 1) % color_count;
+                vec4 color = mix(texelFetch(palette_tex, ivec2(1 + index, v_pal), 0),
+                                 texelFetch(palette_tex, ivec2(1 + next_index, v_pal), 0),
+                                 fract(pos));
+                
+                float dist = length(v_uv);
+                float delta = 1.5 * fwidth(dist);
+                float alpha = 1.0 - smoothstep(1.0 - delta, 1.0, dist);
+                fragColor = vec4(color.rgb, color.a * u_alpha * alpha);
+            }
+        ''')
+
     shader = gpu.shader.create_from_info(info)
     _SHADER_CACHE[name] = shader
     return shader
@@ -755,8 +829,47 @@ def _rainbow_rgba(step_t, time_sec):
     r, g, b = colorsys.hsv_to_rgb(hue, saturation * sat_damp, min(1.0, value * boost))
     return (r, g, b, 1.0)
 
-def get_native_link_points(link, v2d, curv, zoom_factor=1.0):
-    """获取连线点列表，根据缩放级别优化采样点数"""
+# 连线细分允许的最大弦高误差（像素）
+LINK_TESSELLATION_TOLERANCE = 0.5
+# 细分段数分桶：段数向上取整到桶内的值，使相同段数的连线能共用索引缓冲
+LINK_SEGMENT_BUCKETS = (1, 2, 4, 6, 8, 12, 16, 24, 32, 48, 64)
+
+def get_link_segment_count(p0, p1, p2, p3, zoom_factor, tolerance=LINK_TESSELLATION_TOLERANCE):
+    """
+    根据屏幕上的曲率和长度计算三次贝塞尔曲线的细分段数（Wang公式）
+    p0..p3 为 View2D 坐标的控制点，zoom_factor 用于换算到像素
+    """
+    # 曲线位于控制多边形的凸包内：控制点偏离弦的距离足够小时按直线处理
+    chord_x = p3[0] - p0[0]
+    chord_y = p3[1] - p0[1]
+    chord_len = hypot(chord_x, chord_y)
+    if chord_len > 1e-9:
+        dev1 = abs((p1[0] - p0[0]) * chord_y - (p1[1] - p0[1]) * chord_x) / chord_len
+        dev2 = abs((p2[0] - p0[0]) * chord_y - (p2[1] - p0[1]) * chord_x) / chord_len
+        if max(dev1, dev2) * zoom_factor <= tolerance:
+            return 1
+    
+    # 二阶差分的最大值决定折线逼近的误差上界
+    ddx = max(abs(p0[0] - 2 * p1[0] + p2[0]), abs(p1[0] - 2 * p2[0] + p3[0]))
+    ddy = max(abs(p0[1] - 2 * p1[1] + p2[1]), abs(p1[1] - 2 * p2[1] + p3[1]))
+    curvature_px = hypot(ddx, ddy) * zoom_factor
+    if curvature_px <= 1e-6:
+        return 1
+    seg = int(sqrt(0.75 * curvature_px / tolerance)) + 1
+    
+    # 段长不必小于2像素
+    length_px = hypot(p3[0] - p0[0], p3[1] - p0[1]) * zoom_factor
+    seg = max(1, min(seg, int(length_px / 2.0) + 1))
+    for bucket in LINK_SEGMENT_BUCKETS:
+        if seg <= bucket:
+            return bucket
+    return LINK_SEGMENT_BUCKETS[-1]
+
+def get_link_control_points(link, curv):
+    """
+    计算连线的三次贝塞尔控制点 (p0, p1, p2, p3)，View2D 坐标
+    直线模式下 p1/p2 取在三等分点上，曲线退化为直线
+    """
     fs, ts = link.from_socket, link.to_socket
     try:
         if not (fs.enabled and ts.enabled):
@@ -770,35 +883,12 @@ def get_native_link_points(link, v2d, curv, zoom_factor=1.0):
     except Exception:
         return None
 
-    y_off = 0
-    y1 += y_off
-    y2 += y_off
-
-    v2r = v2d.view_to_region
-    
-    # 性能优化：根据缩放级别动态调整采样点数
-    # 缩放级别越低（视图越远），使用越少的采样点
-    if zoom_factor > 0.5:
-        seg = 24  # 高缩放级别：详细采样
-    elif zoom_factor > 0.2:
-        seg = 16  # 中等缩放级别
-    elif zoom_factor > 0.1:
-        seg = 12  # 低缩放级别
-    else:
-        seg = 8   # 极低缩放级别：最少采样
-
+    p0 = (x1, y1)
+    p3 = (x2, y2)
     if curv <= 0.001:
-        p0 = (x1, y1)
-        p3 = (x2, y2)
         p1 = (x1 + (x2 - x1) * (1.0 / 3.0), y1 + (y2 - y1) * (1.0 / 3.0))
         p2 = (x1 + (x2 - x1) * (2.0 / 3.0), y1 + (y2 - y1) * (2.0 / 3.0))
-        pts = []
-        for i in range(seg + 1):
-            t = i / seg
-            x = x1 + t * (x2 - x1)
-            y = y1 + t * (y2 - y1)
-            pts.append(v2r(x, y, clip=False))
-        return pts
+        return p0, p1, p2, p3
 
     dx = abs(x2 - x1)
     dy = abs(y2 - y1)
@@ -811,10 +901,19 @@ def get_native_link_points(link, v2d, curv, zoom_factor=1.0):
     clamp_factor = min(1.0, slope * (4.5 - 0.25 * curving_factor))
     handle_offset = curving_factor * 0.1 * dx * clamp_factor
 
-    p0 = (x1, y1)
-    p3 = (x2, y2)
     p1 = (x1 + handle_offset, y1)
     p2 = (x2 - handle_offset, y2)
+    return p0, p1, p2, p3
+
+def tessellate_link_points(ctrl, v2d, zoom_factor=1.0):
+    """将控制点细分为 Region 像素坐标的折线，根据屏幕上的长度和弯曲程度自适应采样点数"""
+    p0, p1, p2, p3 = ctrl
+    v2r = v2d.view_to_region
+    
+    # 性能优化：按屏幕上的弯曲程度与长度决定采样点数（直线、短连线只需很少的点）
+    seg = get_link_segment_count(p0, p1, p2, p3, zoom_factor)
+    if seg <= 1:
+        return [v2r(p0[0], p0[1], clip=False), v2r(p3[0], p3[1], clip=False)]
     
     pts = []
     for i in range(seg + 1):
@@ -853,6 +952,87 @@ def _is_link_visible(region, pts, margin=50):
     
     return False
 
+def _path_intersects_rect(path, rect):
+    """折线的包围盒是否与矩形 (xmin, ymin, xmax, ymax) 相交"""
+    xs = [pt[0] for pt in path]
+    ys = [pt[1] for pt in path]
+    return not (max(xs) < rect[0] or min(xs) > rect[2] or max(ys) < rect[1] or min(ys) > rect[3])
+
+def _clip_segment_to_rect(x0, y0, x1, y1, rect):
+    """Liang-Barsky 线段裁剪，返回线段在矩形内部分的参数区间 (t0, t1)，完全在外返回 None"""
+    xmin, ymin, xmax, ymax = rect
+    dx = x1 - x0
+    dy = y1 - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - xmin), (dx, xmax - x0), (-dy, y0 - ymin), (dy, ymax - y0)):
+        if p == 0.0:
+            if q < 0.0:
+                return None
+            continue
+        r = q / p
+        if p < 0.0:
+            if r > t1:
+                return None
+            if r > t0:
+                t0 = r
+        else:
+            if r < t0:
+                return None
+            if r < t1:
+                t1 = r
+    return t0, t1
+
+def clip_polyline_to_rect(pts, rect):
+    """
+    将折线裁剪到矩形 rect = (xmin, ymin, xmax, ymax) 内
+    返回可见的子段列表 [(points, progress), ...]，progress 为各点在整条折线上按弧长归一化的位置，
+    保证裁剪后渐变动画的相位与未裁剪时一致
+    """
+    count = len(pts)
+    if count < 2:
+        return []
+    
+    cumulative = [0.0]
+    total = 0.0
+    for i in range(count - 1):
+        total += hypot(pts[i + 1][0] - pts[i][0], pts[i + 1][1] - pts[i][1])
+        cumulative.append(total)
+    inv_total = 1.0 / total if total > 0 else 0.0
+    
+    xmin, ymin, xmax, ymax = rect
+    if all(xmin <= x <= xmax and ymin <= y <= ymax for x, y in pts):
+        return [(pts, [d * inv_total for d in cumulative])]
+    
+    runs = []
+    run_pts = None
+    run_u = None
+    for i in range(count - 1):
+        x0, y0 = pts[i]
+        x1, y1 = pts[i + 1]
+        clipped = _clip_segment_to_rect(x0, y0, x1, y1, rect)
+        if clipped is None:
+            if run_pts is not None:
+                runs.append((run_pts, run_u))
+                run_pts = None
+            continue
+        t0, t1 = clipped
+        seg_len = cumulative[i + 1] - cumulative[i]
+        end_pt = (x0 + (x1 - x0) * t1, y0 + (y1 - y0) * t1)
+        end_u = (cumulative[i] + seg_len * t1) * inv_total
+        if run_pts is None or t0 > 0.0:
+            if run_pts is not None:
+                runs.append((run_pts, run_u))
+            run_pts = [(x0 + (x1 - x0) * t0, y0 + (y1 - y0) * t0)]
+            run_u = [(cumulative[i] + seg_len * t0) * inv_total]
+        run_pts.append(end_pt)
+        run_u.append(end_u)
+        if t1 < 1.0:
+            runs.append((run_pts, run_u))
+            run_pts = None
+    if run_pts is not None:
+        runs.append((run_pts, run_u))
+    return runs
+
 def dpi_fac():
     prefs = bpy.context.preferences.system
     return prefs.dpi / 72
@@ -918,74 +1098,278 @@ def _get_socket_index_cached(cache, node, socket, is_output):
         cache[key] = socket_map
     return socket_map.get(socket.as_pointer())
 
-def _get_line_strip_geometry(vertices, width):
-    if len(vertices) < 2:
-        return [], []
-    pos_data = []
-    uv_data = []
+def _get_line_strip_arrays(lines, width, u=None):
+    """
+    批量计算点数相同的多条折线的条带几何（NumPy 向量化）
+    lines: 形状为 (k, n, 2) 的点数组
+    u: 可选 (k, n) 的进度；未提供时按每条折线自身的弧长归一化
+    返回: pos (k*n*2, 2) 每个点左右各一个顶点; u (k, n)
+    """
+    seg = np.diff(lines, axis=1)
+    seg_len = np.hypot(seg[..., 0], seg[..., 1])
+    
+    if u is None:
+        distances = np.zeros(lines.shape[:2])
+        np.cumsum(seg_len, axis=1, out=distances[:, 1:])
+        total_length = distances[:, -1:]
+        u = np.divide(distances, total_length, out=np.zeros_like(distances), where=total_length > 0)
+    
+    # 线段方向（零长度线段得到零向量，与 Vector.normalized() 行为一致）
+    seg_dir = seg / np.maximum(seg_len, 1e-12)[..., None]
+    tangent = np.empty_like(lines)
+    tangent[:, 0] = seg_dir[:, 0]
+    tangent[:, -1] = seg_dir[:, -1]
+    tangent[:, 1:-1] = seg_dir[:, :-1] + seg_dir[:, 1:]
+    tangent /= np.maximum(np.hypot(tangent[..., 0], tangent[..., 1]), 1e-12)[..., None]
+    
     half_w = width * 0.5
-    count = len(vertices)
-    verts = [Vector(v) for v in vertices]
+    normal = np.empty_like(tangent)
+    normal[..., 0] = -tangent[..., 1] * half_w
+    normal[..., 1] = tangent[..., 0] * half_w
     
-    distances = [0.0]
-    total_length = 0.0
-    for i in range(count - 1):
-        dist = (verts[i+1] - verts[i]).length
-        total_length += dist
-        distances.append(total_length)
-    
-    for i in range(count):
-        curr_p = verts[i]
-        if i == 0:
-            tangent = (verts[1] - curr_p).normalized()
-        elif i == count - 1:
-            tangent = (curr_p - verts[i-1]).normalized()
-        else:
-            t1 = (curr_p - verts[i-1]).normalized()
-            t2 = (verts[i+1] - curr_p).normalized()
-            tangent = (t1 + t2).normalized()
-        
-        normal = Vector((-tangent.y, tangent.x))
-        p0 = curr_p + normal * half_w
-        p1 = curr_p - normal * half_w
-        
-        pos_data.append((p0.x, p0.y))
-        pos_data.append((p1.x, p1.y))
-        
-        if total_length > 0:
-            u = distances[i] / total_length
-        else:
-            u = 0.0
-        uv_data.append((u, 1.0))
-        uv_data.append((u, -1.0))
-    return pos_data, uv_data
+    pos = np.empty(lines.shape[:2] + (2, 2))
+    pos[:, :, 0] = lines + normal
+    pos[:, :, 1] = lines - normal
+    return pos.reshape(-1, 2), u
+
+# 16 位定点位置：默认 1/8 像素精度；批次范围超出 int16 时自动放大步长
+POS_QUANT_STEP = 0.125
+_INT16_LIMIT = 32000.0
+_UNORM16 = 32767.0
+
+def _pack_positions(pos):
+    """
+    将像素坐标打包为相对于批次原点的 int16 定点坐标
+    返回: (packed, origin, scale)，着色器中 pos = origin + packed * scale
+    """
+    lo = pos.min(axis=0)
+    hi = pos.max(axis=0)
+    origin = (lo + hi) * 0.5
+    extent = float(np.max(hi - lo)) * 0.5
+    scale = max(POS_QUANT_STEP, extent / _INT16_LIMIT)
+    packed = np.rint((pos - origin) / scale).astype(np.int16)
+    return packed, (float(origin[0]), float(origin[1])), scale
+
+def _pack_unorm(values):
+    """将 [-1, 1] 范围的数值打包为归一化 int16"""
+    return np.rint(np.clip(values, -1.0, 1.0) * _UNORM16).astype(np.int16)
+
+# 线条三角形索引缓存：key 为 (每条折线的点数, 折线条数)
+_STRIP_INDEX_PATTERNS = {}
+_STRIP_INDEX_CACHE = {}
+_STRIP_INDEX_CACHE_LIMIT = 256
+_VERT_FORMATS = {}
+
+def _get_line_vert_format(with_palette=False):
+    fmt = _VERT_FORMATS.get(with_palette)
+    if fmt is None:
+        # pos: 相对批次原点的 int16 定点坐标; uv: 归一化 int16; pal: 调色板行号; hop: 层号
+        fmt = gpu.types.GPUVertFormat()
+        fmt.attr_add(id="pos", comp_type='I16', len=2, fetch_mode='INT_TO_FLOAT')
+        fmt.attr_add(id="uv", comp_type='I16', len=2, fetch_mode='INT_TO_FLOAT_UNIT')
+        if with_palette:
+            fmt.attr_add(id="pal", comp_type='U16', len=1, fetch_mode='INT')
+            fmt.attr_add(id="hop", comp_type='U16', len=1, fetch_mode='INT')
+        _VERT_FORMATS[with_palette] = fmt
+    return fmt
+
+def _get_strip_index_pattern(point_count):
+    """单条折线（每个点左右各一个顶点）的三角形索引模板"""
+    pattern = _STRIP_INDEX_PATTERNS.get(point_count)
+    if pattern is None:
+        pattern = []
+        for i in range(point_count - 1):
+            a = i * 2
+            pattern.append((a, a + 1, a + 2))
+            pattern.append((a + 1, a + 3, a + 2))
+        _STRIP_INDEX_PATTERNS[point_count] = pattern
+    return pattern
+
+def _get_strip_index_buffer(point_count, line_count):
+    """
+    获取点数相同的 line_count 条折线共用的 TRIS 索引缓冲
+    连线集合不变时每帧都能命中缓存，只需重新上传顶点数据
+    """
+    key = (point_count, line_count)
+    ibo = _STRIP_INDEX_CACHE.get(key)
+    if ibo is not None:
+        return ibo
+    if len(_STRIP_INDEX_CACHE) >= _STRIP_INDEX_CACHE_LIMIT:
+        _STRIP_INDEX_CACHE.clear()
+    pattern = _get_strip_index_pattern(point_count)
+    stride = point_count * 2
+    indices = [
+        (a + base, b + base, c + base)
+        for base in range(0, line_count * stride, stride)
+        for (a, b, c) in pattern
+    ]
+    ibo = gpu.types.GPUIndexBuf(type='TRIS', seq=indices)
+    _STRIP_INDEX_CACHE[key] = ibo
+    return ibo
+
+# --- 调色板纹理 ---
+# 行 0: 常量调色板; 行 1: Field调色板; 之后每种socket类型各两行（常量/Field，已做色相偏移）
+PALETTE_ROW_CONSTANT = 0
+PALETTE_ROW_FIELD = 1
+_PALETTE_TYPE_ROWS = {name: 2 + i * 2 for i, name in enumerate(SOCKET_TYPE_HUE_OFFSETS)}
+
+_palette_state = {
+    'key': None,
+    'texture': None,
+}
+
+def get_palette_row(is_field, socket_type=None):
+    """获取连线使用的调色板行号；socket_type 为 None 表示不按数据类型着色"""
+    base = _PALETTE_TYPE_ROWS.get(socket_type, 0) if socket_type else 0
+    return base + (PALETTE_ROW_FIELD if is_field else PALETTE_ROW_CONSTANT)
+
+# 调色板颜色不足2个时使用的默认值
+_DEFAULT_PALETTE = [(0.0, 0.5, 1.0, 1.0), (0.0, 1.0, 0.8, 1.0), (1.0, 1.0, 0.0, 1.0),
+                    (1.0, 0.5, 0.0, 1.0), (1.0, 0.0, 0.5, 1.0)]
+
+def _build_palette_rows(grad_cols, field_grad_cols):
+    if len(grad_cols) < 2:
+        grad_cols = _DEFAULT_PALETTE
+    if len(field_grad_cols) < 2:
+        field_grad_cols = _DEFAULT_PALETTE
+    rows = [list(grad_cols), list(field_grad_cols)]
+    for socket_type, hue_offset in SOCKET_TYPE_HUE_OFFSETS.items():
+        effective_offset = hue_offset * 0.5
+        rows.append([shift_hue(c, effective_offset) for c in grad_cols])
+        rows.append([shift_hue(c, effective_offset) for c in field_grad_cols])
+    return rows
+
+def ensure_palette_texture(grad_cols, field_grad_cols, version):
+    """
+    仅在调色板或色相偏移表变化时重新上传调色板纹理
+    必须在有GPU上下文的绘制回调中调用
+    version 为设置的版本号（change_tracker），与色相偏移表的哈希一起用作缓存键
+    """
+    key = (version, _socket_style_tables_hash())
+    if _palette_state['texture'] is not None and _palette_state['key'] == key:
+        return _palette_state['texture']
+    
+    rows = _build_palette_rows(grad_cols, field_grad_cols)
+    width = 1 + max(max(len(row) for row in rows), 1)
+    data = np.zeros((len(rows), width, 4), dtype=np.float32)
+    for r, row in enumerate(rows):
+        data[r, 0, 0] = len(row)
+        for i, c in enumerate(row):
+            data[r, 1 + i] = (c[0], c[1], c[2], c[3] if len(c) > 3 else 1.0)
+    
+    buf = gpu.types.Buffer('FLOAT', data.size, data.ravel().tolist())
+    _palette_state['texture'] = gpu.types.GPUTexture((width, len(rows)), format='RGBA32F', data=buf)
+    _palette_state['key'] = key
+    return _palette_state['texture']
+
+# --- 按区域缓存 ---
+# 追踪结果、几何、批次和粒子缓存每个节点编辑器区域各一份，多个编辑器同时打开时互不驱逐；
+# 区域数量超出上限时丢弃最久未绘制的区域
+DRAW_CACHE_REGION_LIMIT = 4
+
+def _get_region_entry(cache, region_key, factory, on_evict=None):
+    """
+    取区域的缓存条目（移到末尾表示最近使用），不存在时用 factory 新建
+    on_evict 用于释放被丢弃条目持有的GPU资源
+    """
+    entry = cache.pop(region_key, None)
+    if entry is None:
+        entry = factory()
+        while len(cache) >= DRAW_CACHE_REGION_LIMIT:
+            evicted = cache.pop(next(iter(cache)))
+            if on_evict is not None:
+                on_evict(evicted)
+    cache[region_key] = entry
+    return entry
+
+# --- GPU 批次缓存 ---
+# 顶点数据只依赖连线几何，几何缓存键（change_tracker 版本号）不变时直接复用批次，
+# 每帧只更新 uniform（时间、透明度、颜色）
+# 区域指针 -> {'key', 'batches'}；_active_batch_cache 指向当前绘制区域的批次字典
+_batch_cache = {}
+_active_batch_cache = {
+    'batches': None,
+}
+
+def begin_batch_cache(region_key, key):
+    """切换到区域的批次缓存，几何缓存键变化时丢弃该区域缓存的所有批次"""
+    entry = _get_region_entry(_batch_cache, region_key, lambda: {'key': None, 'batches': {}})
+    if entry['key'] != key:
+        entry['batches'].clear()
+        entry['key'] = key
+    _active_batch_cache['batches'] = entry['batches']
+
+def _get_active_batches(cache_slot):
+    """当前区域批次缓存（cache_slot 为 None 或不在绘制回调中时不缓存）"""
+    if cache_slot is None:
+        return None
+    return _active_batch_cache['batches']
 
-def draw_batch_lines(all_lines_data, shader_name, width, colors=None, time_sec=0.0, overall_opacity=1.0):
+def _build_line_batches(all_lines_data, width, use_palette, palette_rows=None, progress=None, hops=None):
+    """按点数分桶构建折线批次，返回 [(batch, origin, pos_scale), ...]"""
+    # 按点数分桶：同一个桶内的折线可以共用同一份索引缓冲，不再需要退化顶点拼接
+    buckets = {}
+    for i, vertices in enumerate(all_lines_data):
+        if not vertices or len(vertices) < 2:
+            continue
+        bucket = buckets.get(len(vertices))
+        if bucket is None:
+            bucket = buckets[len(vertices)] = ([], [], [], [])
+        bucket[0].append(vertices)
+        bucket[1].append(palette_rows[i] if palette_rows else PALETTE_ROW_CONSTANT)
+        if progress:
+            bucket[2].append(progress[i])
+        bucket[3].append(hops[i] if hops else 0)
+    
+    batches = []
+    fmt = _get_line_vert_format(use_palette)
+    for point_count, (lines, rows, line_progress, line_hops) in buckets.items():
+        u = np.asarray(line_progress, dtype=np.float64) if line_progress else None
+        pos, u = _get_line_strip_arrays(np.asarray(lines, dtype=np.float64), width, u)
+        packed_pos, origin, pos_scale = _pack_positions(pos)
+        uv = np.empty((u.size, 2, 2))
+        uv[:, :, 0] = u.reshape(-1, 1)
+        uv[:, 0, 1] = 1.0
+        uv[:, 1, 1] = -1.0
+        
+        vbo = gpu.types.GPUVertBuf(fmt, len(packed_pos))
+        vbo.attr_fill("pos", packed_pos)
+        vbo.attr_fill("uv", _pack_unorm(uv.reshape(-1, 2)))
+        if use_palette:
+            vbo.attr_fill("pal", np.repeat(np.asarray(rows, dtype=np.uint16), point_count * 2))
+            vbo.attr_fill("hop", np.repeat(np.minimum(line_hops, 65535).astype(np.uint16), point_count * 2))
+        ibo = _get_strip_index_buffer(point_count, len(lines))
+        batches.append((gpu.types.GPUBatch(type='TRIS', buf=vbo, elem=ibo), origin, pos_scale))
+    return batches
+
+def draw_batch_lines(all_lines_data, shader_name, width, colors=None, time_sec=0.0, overall_opacity=1.0, palette_rows=None, progress=None, cache_slot=None, hops=None, hop_fade=None):
+    """
+    批量绘制折线
+    GRADIENT 着色器从调色板纹理取色（需先调用 ensure_palette_texture），
+    palette_rows 为每条折线的调色板行号（默认为常量调色板）
+    progress 为每条折线各点的进度（裁剪后的子段需沿用整条连线的弧长进度）
+    cache_slot 不为 None 时，在当前区域和几何缓存键下复用已构建的批次（见 begin_batch_cache）
+    hops 为每条折线的层号（写入顶点属性，随批次缓存）；hop_fade 为 (淡化层数, 最远处透明度系数)，
+    为 None 时不按层号淡化（只改变 uniform，不需要重建批次）
+    """
     if not all_lines_data:
         return
 
     shader = get_shader(shader_name)
     if not shader:
         return
-
-    all_pos = []
-    all_uv = []
     
-    for vertices in all_lines_data:
-        if not vertices or len(vertices) < 2:
-            continue
-        pos, uv = _get_line_strip_geometry(vertices, width)
-        if not pos:
-            continue
-        if all_pos:
-            all_pos.append(all_pos[-1])
-            all_uv.append(all_uv[-1])
-            all_pos.append(pos[0])
-            all_uv.append(uv[0])
-        all_pos.extend(pos)
-        all_uv.extend(uv)
-        
-    if not all_pos:
+    use_palette = shader_name == 'GRADIENT'
+    if use_palette and _palette_state['texture'] is None:
+        return
+
+    slot_cache = _get_active_batches(cache_slot)
+    batches = slot_cache.get(cache_slot) if slot_cache is not None else None
+    if batches is None:
+        batches = _build_line_batches(all_lines_data, width, use_palette, palette_rows, progress, hops)
+        if slot_cache is not None:
+            slot_cache[cache_slot] = batches
+    if not batches:
         return
 
     shader.bind()
@@ -994,30 +1378,12 @@ def draw_batch_lines(all_lines_data, shader_name, width, colors=None, time_sec=0
         shader.uniform_float("u_alpha", overall_opacity)
     elif shader_name == 'GRADIENT':
         shader.uniform_float("u_time", time_sec % 1000.0)
-        shader.uniform_float("u_alpha", overall_opacity)
-        
-        # 获取颜色数量和颜色列表
-        color_count = len(colors) if colors else 0
-        if color_count < 2:
-            # 如果颜色不足，使用默认值
-            color_count = 5
-            colors = [(0.0, 0.5, 1.0, 1.0), (0.0, 1.0, 0.8, 1.0), (1.0, 1.0, 0.0, 1.0),
-                      (1.0, 0.5, 0.0, 1.0), (1.0, 0.0, 0.5, 1.0)]
-        
-        # 应用全局透明度到每个颜色的alpha值
-        # 每个颜色已经有自己的alpha值，现在再乘以全局透明度
-        colors = [(c[0], c[1], c[2], (c[3] * overall_opacity) if len(c) > 3 else overall_opacity) for c in colors]
-        
-        # 设置颜色数量
-        shader.uniform_int("u_color_count", color_count)
-        
-        # 传入最多10个颜色（不足的用最后一个颜色填充）
-        color_list = list(colors[:color_count])
-        while len(color_list) < 10:
-            color_list.append(color_list[-1] if color_list else (1.0, 1.0, 1.0, overall_opacity))
-        
-        for i in range(10):
-            shader.uniform_float(f"color{i+1}", color_list[i])
+        # 与旧版一致：颜色自身alpha先乘一次全局透明度，着色器中再乘一次
+        shader.uniform_float("u_alpha", overall_opacity * overall_opacity)
+        shader.uniform_sampler("palette_tex", _palette_state['texture'])
+        hop_range, hop_min_alpha = hop_fade if hop_fade else (0, 1.0)
+        shader.uniform_float("u_hop_scale", 1.0 / hop_range if hop_range > 0 else 0.0)
+        shader.uniform_float("u_hop_min_alpha", hop_min_alpha)
     elif shader_name == 'SMOOTH_COLOR':
         if colors and len(colors) >= 1:
             # 应用透明度
@@ -1028,10 +1394,40 @@ def draw_batch_lines(all_lines_data, shader_name, width, colors=None, time_sec=0
                 color = (*color[:3], overall_opacity)
             shader.uniform_float("color", color)
     
-    batch = batch_for_shader(shader, 'TRI_STRIP', {"pos": all_pos, "uv": all_uv})
-    batch.draw(shader)
-
-def draw_batch_circles(batch_circles, radius, color, overall_opacity=1.0):
+    for batch, origin, pos_scale in batches:
+        shader.uniform_float("u_origin", origin)
+        shader.uniform_float("u_pos_scale", pos_scale)
+        batch.draw(shader)
+
+_QUAD_INDEX_CACHE = {}
+_QUAD_CORNERS = np.array(((-1.0, -1.0), (1.0, -1.0), (-1.0, 1.0), (1.0, 1.0)))
+
+def _get_quad_index_buffer(quad_count):
+    """每个四边形 4 个顶点、2 个三角形的索引缓冲（按数量缓存）"""
+    ibo = _QUAD_INDEX_CACHE.get(quad_count)
+    if ibo is not None:
+        return ibo
+    if len(_QUAD_INDEX_CACHE) >= _STRIP_INDEX_CACHE_LIMIT:
+        _QUAD_INDEX_CACHE.clear()
+    base = np.arange(quad_count, dtype=np.int32)[:, None] * 4
+    indices = (base + np.array((0, 2, 1, 1, 2, 3), dtype=np.int32)).reshape(-1, 3)
+    ibo = gpu.types.GPUIndexBuf(type='TRIS', seq=indices.tolist())
+    _QUAD_INDEX_CACHE[quad_count] = ibo
+    return ibo
+
+def _build_circle_batch(batch_circles, size):
+    centers = np.asarray(batch_circles, dtype=np.float64)
+    pos = (centers[:, None, :] + _QUAD_CORNERS * size).reshape(-1, 2)
+    packed_pos, origin, pos_scale = _pack_positions(pos)
+    uv = np.broadcast_to(_pack_unorm(_QUAD_CORNERS), (len(centers), 4, 2)).reshape(-1, 2)
+    
+    vbo = gpu.types.GPUVertBuf(_get_line_vert_format(), len(packed_pos))
+    vbo.attr_fill("pos", packed_pos)
+    vbo.attr_fill("uv", np.ascontiguousarray(uv))
+    batch = gpu.types.GPUBatch(type='TRIS', buf=vbo, elem=_get_quad_index_buffer(len(centers)))
+    return batch, origin, pos_scale
+
+def draw_batch_circles(batch_circles, radius, color, overall_opacity=1.0, cache_slot=None):
     if not batch_circles or radius <= 0:
         return
     shader = get_shader('SDF_CIRCLE')
@@ -1040,40 +1436,324 @@ def draw_batch_circles(batch_circles, radius, color, overall_opacity=1.0):
     adjusted_radius = radius * 1.0
     size = adjusted_radius + 2.0
     uv_scale = size / adjusted_radius if adjusted_radius > 0 else 1.0
-    all_pos = []
-    all_uv = []
-    o0 = (-size, -size)
-    o1 = ( size, -size)
-    o2 = (-size,  size)
-    o3 = ( size,  size)
-    u0 = (-uv_scale, -uv_scale)
-    u1 = ( uv_scale, -uv_scale)
-    u2 = (-uv_scale,  uv_scale)
-    u3 = ( uv_scale,  uv_scale)
-    
-    for (cx, cy) in batch_circles:
-        p0 = (cx + o0[0], cy + o0[1])
-        p1 = (cx + o1[0], cy + o1[1])
-        p2 = (cx + o2[0], cy + o2[1])
-        p3 = (cx + o3[0], cy + o3[1])
-        all_pos.extend([p0, p2, p1])
-        all_uv.extend([u0, u2, u1])
-        all_pos.extend([p1, p2, p3])
-        all_uv.extend([u1, u2, u3])
+    
+    slot_cache = _get_active_batches(cache_slot)
+    cached = slot_cache.get(cache_slot) if slot_cache is not None else None
+    if cached is None:
+        cached = _build_circle_batch(batch_circles, size)
+        if slot_cache is not None:
+            slot_cache[cache_slot] = cached
+    batch, origin, pos_scale = cached
     
     # 应用透明度到颜色
     if len(color) >= 4:
         adjusted_color = (color[0], color[1], color[2], color[3] * overall_opacity)
     else:
         adjusted_color = (*color[:3], overall_opacity)
-        
-    batch = batch_for_shader(shader, 'TRIS', {"pos": all_pos, "uv": all_uv})
+    
     shader.bind()
     shader.uniform_float("color", adjusted_color)
+    shader.uniform_float("u_uv_scale", uv_scale)
+    shader.uniform_float("u_origin", origin)
+    shader.uniform_float("u_pos_scale", pos_scale)
     gpu.state.blend_set('ALPHA')
     batch.draw(shader)
     gpu.state.blend_set('NONE')
 
+def _hop_alpha(hop, hop_fade):
+    """按层淡化的透明度系数（与 GRADIENT 着色器中的 hop_alpha 一致）"""
+    if not hop_fade:
+        return 1.0
+    hop_range, hop_min_alpha = hop_fade
+    if hop_range <= 0:
+        return 1.0
+    return 1.0 + (hop_min_alpha - 1.0) * min(hop / hop_range, 1.0)
+
+def _group_by_hop_alpha(link_info_list, hop_fade):
+    """
+    按淡化系数分组：底层背景和圆圈使用统一颜色的着色器，每组单独绘制一次
+    （层号超出淡化层数后系数相同，组数不超过淡化层数 + 1）
+    """
+    groups = {}
+    for info in link_info_list:
+        groups.setdefault(_hop_alpha(info['hop'], hop_fade), []).append(info)
+    return groups.items()
+
+def _hop_slot(cache_slot, hop_alpha):
+    return cache_slot if hop_alpha == 1.0 else (cache_slot, hop_alpha)
+
+def _draw_backing_lines(link_info_list, backing_color_setting, width_backing, overall_opacity, hop_fade=None):
+    """底层背景：给所有连线画背景（按层淡化时与主线一起变淡）"""
+    # 确保是RGBA格式的tuple，并确保所有值都是float（draw_batch_lines会自动应用overall_opacity）
+    if isinstance(backing_color_setting, (list, tuple)) and len(backing_color_setting) >= 4:
+        backing_color = (
+            float(backing_color_setting[0]),
+            float(backing_color_setting[1]),
+            float(backing_color_setting[2]),
+            float(backing_color_setting[3])
+        )
+    else:
+        backing_color = (0.0, 0.0, 0.0, 0.55)
+    for hop_alpha, infos in _group_by_hop_alpha(link_info_list, hop_fade):
+        all_backing = []
+        all_backing_progress = []
+        for info in infos:
+            for run_pts, run_u in info['runs']:
+                all_backing.append(run_pts)
+                all_backing_progress.append(run_u)
+        if not all_backing:
+            continue
+        color = (*backing_color[:3], backing_color[3] * hop_alpha)
+        draw_batch_lines(all_backing, 'SMOOTH_COLOR', width_backing, colors=[color], overall_opacity=overall_opacity, progress=all_backing_progress, cache_slot=_hop_slot('backing', hop_alpha))
+
+def _draw_main_lines(main_links, enable_type_colors, width_main, time_sec, overall_opacity, hop_fade=None):
+    """主线：所有调色板都在同一张纹理中，按行号区分，一次批量绘制"""
+    if not main_links:
+        return
+    main_lines = []
+    main_rows = []
+    main_progress = []
+    main_hops = []
+    for link_info in main_links:
+        socket_type = get_socket_type_name(link_info['to_socket']) if enable_type_colors else None
+        row = get_palette_row(link_info['is_field'], socket_type)
+        for run_pts, run_u in link_info['runs']:
+            main_lines.append(run_pts)
+            main_rows.append(row)
+            main_progress.append(run_u)
+            main_hops.append(link_info['hop'])
+    draw_batch_lines(main_lines, 'GRADIENT', width_main, time_sec=time_sec, overall_opacity=overall_opacity, palette_rows=main_rows, progress=main_progress, cache_slot='main', hops=main_hops, hop_fade=hop_fade)
+
+def _draw_endpoint_circles(link_info_list, grad_cols, field_grad_cols, enable_type_colors, zoom, overall_opacity, settings_version=None, hop_fade=None):
+    """背景圆圈与端点圆圈 - 根据连线类型（Constant或Field）显示不同颜色，按层淡化时与主线一起变淡"""
+    style_table = None
+    if enable_type_colors:
+        # 性能优化：颜色和半径来自预计算的查找表，按 (颜色, 半径) 分组批量绘制端点圆圈
+        style_table = get_endpoint_style_table(grad_cols, field_grad_cols, version=settings_version)
+    
+    for hop_alpha, infos in _group_by_hop_alpha(link_info_list, hop_fade):
+        opacity = overall_opacity * hop_alpha
+        
+        # 背景圆圈（给所有连线）
+        all_circles_backing = []
+        for info in infos:
+            all_circles_backing.append(info['start_pos'])
+            all_circles_backing.append(info['end_pos'])
+        if all_circles_backing:
+            backing_circle_color = (0, 0, 0, 0.55 * overall_opacity)
+            draw_batch_circles(all_circles_backing, 7.0 * zoom, backing_circle_color, overall_opacity=opacity, cache_slot=_hop_slot('circles_backing', hop_alpha))
+
+        # 端点圆圈 - 根据连线类型（Constant或Field）显示不同颜色
+        if style_table is not None:
+            circles_by_key = {}  # key: (color_tuple, radius) -> list of positions
+            for link_info in infos:
+                socket_type = get_socket_type_name(link_info['to_socket'])
+                if (socket_type, False, False) not in style_table:
+                    socket_type = None
+                is_field = link_info.get('is_field', False)
+                circles_by_key.setdefault(style_table[(socket_type, is_field, False)], []).append(link_info['start_pos'])
+                circles_by_key.setdefault(style_table[(socket_type, is_field, True)], []).append(link_info['end_pos'])
+            
+            # 批量绘制所有相同颜色和大小的圆圈
+            for (color, radius), positions in circles_by_key.items():
+                if positions:
+                    draw_batch_circles(positions, radius * zoom, color, overall_opacity=opacity, cache_slot=_hop_slot(('circles', color, radius), hop_alpha))
+        else:
+            # 根据连线类型使用不同的颜色方案
+            constant_links = [info for info in infos if not info.get('is_field', False)]
+            field_links = [info for info in infos if info.get('is_field', False)]
+            constant_start_positions = [info['start_pos'] for info in constant_links]
+            constant_end_positions = [info['end_pos'] for info in constant_links]
+            field_start_positions = [info['start_pos'] for info in field_links]
+            field_end_positions = [info['end_pos'] for info in field_links]
+            
+            # Constant连线端点
+            if constant_start_positions or constant_end_positions:
+                c_start = grad_cols[0] if grad_cols else (1,1,1,1)
+                c_end = grad_cols[-1] if grad_cols else c_start
+                if constant_start_positions:
+                    draw_batch_circles(constant_start_positions, 5.0 * zoom, c_start, overall_opacity=opacity, cache_slot=_hop_slot('constant_start', hop_alpha))
+                if constant_end_positions:
+                    draw_batch_circles(constant_end_positions, 5.0 * zoom, c_end, overall_opacity=opacity, cache_slot=_hop_slot('constant_end', hop_alpha))
+            
+            # Field连线端点
+            if field_start_positions or field_end_positions:
+                f_start = field_grad_cols[0] if field_grad_cols else (0.8, 0.2, 1.0, 1.0)
+                f_end = field_grad_cols[-1] if field_grad_cols else f_start
+                if field_start_positions:
+                    draw_batch_circles(field_start_positions, 5.0 * zoom, f_start, overall_opacity=opacity, cache_slot=_hop_slot('field_start', hop_alpha))
+                if field_end_positions:
+                    draw_batch_circles(field_end_positions, 5.0 * zoom, f_end, overall_opacity=opacity, cache_slot=_hop_slot('field_end', hop_alpha))
+
+# --- 流动粒子 ---
+# 每条连线一个四边形（控制点为 View2D 坐标），按每条连线的粒子数实例化绘制，
+# 相位取自 gl_InstanceID；平移缩放只更新 View2D -> Region 的 uniform，动画帧只更新时间
+# 区域指针 -> {'key', 'batch'}
+_particle_batch_cache = {}
+_PARTICLE_VERT_FORMAT = None
+
+def _get_particle_vert_format():
+    global _PARTICLE_VERT_FORMAT
+    if _PARTICLE_VERT_FORMAT is None:
+        fmt = gpu.types.GPUVertFormat()
+        fmt.attr_add(id="ctrl_a", comp_type='F32', len=4, fetch_mode='FLOAT')
+        fmt.attr_add(id="ctrl_b", comp_type='F32', len=4, fetch_mode='FLOAT')
+        fmt.attr_add(id="corner", comp_type='I16', len=2, fetch_mode='INT_TO_FLOAT_UNIT')
+        fmt.attr_add(id="pal", comp_type='U16', len=1, fetch_mode='INT')
+        _PARTICLE_VERT_FORMAT = fmt
+    return _PARTICLE_VERT_FORMAT
+
+def _build_particle_batch(ctrl_list, rows):
+    """每条连线（贝塞尔段）一个四边形，粒子由实例化绘制生成"""
+    link_count = len(ctrl_list)
+    
+    ctrl = np.asarray(ctrl_list, dtype=np.float32).reshape(link_count, 8)
+    ctrl = np.repeat(ctrl, 4, axis=0)
+    corner = np.tile(_pack_unorm(_QUAD_CORNERS), (link_count, 1))
+    pal = np.repeat(np.asarray(rows, dtype=np.uint16), 4)
+    
+    vbo = gpu.types.GPUVertBuf(_get_particle_vert_format(), link_count * 4)
+    vbo.attr_fill("ctrl_a", np.ascontiguousarray(ctrl[:, :4]))
+    vbo.attr_fill("ctrl_b", np.ascontiguousarray(ctrl[:, 4:]))
+    vbo.attr_fill("corner", corner)
+    vbo.attr_fill("pal", pal)
+    return gpu.types.GPUBatch(type='TRIS', buf=vbo, elem=_get_quad_index_buffer(link_count))
+
+def _collect_particle_segments(tree, units, enable_type_colors, curv_factor):
+    """
+    追踪结果中所有连线的控制点和调色板行号（与视图无关，不做视口裁剪：
+    区域外的粒子由GPU裁掉，平移缩放后不需要重建）
+    """
+    socket_index_cache = {}
+    ctrl_list = []
+    rows = []
+    for unit in units:
+        first_link = unit[0]
+        last_link = unit[-1]
+        fs = getattr(first_link, "from_socket", None)
+        ts = getattr(last_link, "to_socket", None)
+        if not fs or not ts:
+            continue
+        if len(unit) == 1:
+            if (_get_socket_index_cached(socket_index_cache, first_link.from_node, fs, True) is None
+                    or _get_socket_index_cached(socket_index_cache, last_link.to_node, ts, False) is None):
+                continue
+        ctrls = []
+        for link in unit:
+            ctrl = get_link_control_points(link, curv_factor)
+            if ctrl is None:
+                break
+            ctrls.append(ctrl)
+        else:
+            socket_type = get_socket_type_name(ts) if enable_type_colors else None
+            row = get_palette_row(is_field_link(tree, last_link), socket_type)
+            ctrl_list.extend(ctrls)
+            rows.extend([row] * len(ctrls))
+    return ctrl_list, rows
+
+def _view2d_affine(v2d):
+    """View2D -> Region 的线性变换 (scale, offset)，region = view * scale + offset"""
+    x0, y0 = v2d.region_to_view(0.0, 0.0)
+    x1, y1 = v2d.region_to_view(1000.0, 1000.0)
+    sx = 1000.0 / (x1 - x0) if abs(x1 - x0) > 1e-8 else 1.0
+    sy = 1000.0 / (y1 - y0) if abs(y1 - y0) > 1e-8 else 1.0
+    return (sx, sy), (-x0 * sx, -y0 * sy)
+
+def _draw_flow_particles(tree, units, enable_type_colors, curv_factor, region, radius, particles_per_link, time_sec, overall_opacity, particle_key):
+    """流动粒子：沿每条连线移动的小圆点，CPU 开销与粒子数量和视图变化无关"""
+    if _palette_state['texture'] is None or particles_per_link < 1:
+        return
+    # 粒子缓存键只含追踪结果（含设置）和连线控制点相关的版本号，不含视图
+    cache = _get_region_entry(_particle_batch_cache, region.as_pointer(), lambda: {'key': None, 'batch': None})
+    if cache['key'] != particle_key:
+        ctrl_list, rows = _collect_particle_segments(tree, units, enable_type_colors, curv_factor)
+        cache['batch'] = _build_particle_batch(ctrl_list, rows) if ctrl_list else None
+        cache['key'] = particle_key
+    if cache['batch'] is None:
+        return
+    
+    shader = get_shader('FLOW_PARTICLE')
+    view_scale, view_offset = _view2d_affine(region.view2d)
+    shader.bind()
+    shader.uniform_float("u_view_scale", view_scale)
+    shader.uniform_float("u_view_offset", view_offset)
+    shader.uniform_float("u_time", time_sec % 1000.0)
+    # 与渐变连线一致：颜色alpha与全局透明度各乘一次
+    shader.uniform_float("u_alpha", overall_opacity * overall_opacity)
+    shader.uniform_float("u_radius", radius)
+    shader.uniform_int("u_particle_count", particles_per_link)
+    shader.uniform_sampler("palette_tex", _palette_state['texture'])
+    cache['batch'].draw_instanced(shader, instance_start=0, instance_count=particles_per_link)
+
+# --- 静态层离屏缓存 ---
+# region 指针 -> {'offscreen', 'size', 'key'}，与其它按区域的缓存一样有数量上限
+_static_layer_cache = {}
+
+def _new_static_layer_entry():
+    return {'offscreen': None, 'size': None, 'key': None}
+
+def _free_static_layer_entry(entry):
+    offscreen = entry['offscreen']
+    entry['offscreen'] = None
+    if offscreen is not None:
+        try:
+            offscreen.free()
+        except Exception:
+            pass
+
+def free_static_layer_cache():
+    for entry in _static_layer_cache.values():
+        _free_static_layer_entry(entry)
+    _static_layer_cache.clear()
+
+def _draw_texture_quad(texture, width, height):
+    """将离屏纹理作为一个全区域的四边形合成到当前帧（纹理内容为预乘alpha）"""
+    shader = gpu.shader.from_builtin('IMAGE')
+    batch = batch_for_shader(
+        shader, 'TRI_FAN',
+        {
+            "pos": ((0, 0), (width, 0), (width, height), (0, height)),
+            "texCoord": ((0, 0), (1, 0), (1, 1), (0, 1)),
+        },
+    )
+    gpu.state.blend_set('ALPHA_PREMULT')
+    shader.bind()
+    shader.uniform_sampler("image", texture)
+    batch.draw(shader)
+    gpu.state.blend_set('ALPHA')
+
+def draw_cached_static_layer(region, key, draw_fn):
+    """
+    绘制缓存的静态层：key 变化（视图、布局、数据流或设置改变）时才调用 draw_fn 重新渲染到离屏纹理
+    离屏缓冲创建失败时返回 False，由调用方直接绘制
+    """
+    width, height = region.width, region.height
+    if width <= 0 or height <= 0:
+        return False
+    region_key = region.as_pointer()
+    entry = _get_region_entry(_static_layer_cache, region_key, _new_static_layer_entry, _free_static_layer_entry)
+    if entry['offscreen'] is None or entry['size'] != (width, height):
+        _free_static_layer_entry(entry)
+        try:
+            entry['offscreen'] = gpu.types.GPUOffScreen(width, height)
+        except Exception as e:
+            print(f"创建静态层离屏缓冲失败: {e}")
+            del _static_layer_cache[region_key]
+            return False
+        entry['size'] = (width, height)
+        entry['key'] = None
+    
+    if entry['key'] != key:
+        with entry['offscreen'].bind():
+            fb = gpu.state.active_framebuffer_get()
+            fb.clear(color=(0.0, 0.0, 0.0, 0.0))
+            gpu.state.blend_set('ALPHA')
+            draw_fn()
+        entry['key'] = key
+    
+    _draw_texture_quad(entry['offscreen'].texture_color, width, height)
+    return True
+
 def get_panel_settings():
     try:
         scene = bpy.context.scene
@@ -1174,8 +1854,20 @@ def get_panel_settings():
                 'trace_mode': getattr(settings, 'trace_mode', 'ALL_SELECTED'),
                 'flow_direction': getattr(settings, 'flow_direction', 'DOWNSTREAM'),
                 'lock_flow': getattr(settings, 'lock_flow', False),
+                'trace_through_groups': getattr(settings, 'trace_through_groups', False),
+                'path_mode': getattr(settings, 'path_mode', 'SHORTEST'),
+                'hop_fade': getattr(settings, 'hop_fade', False),
+                'hop_fade_range': getattr(settings, 'hop_fade_range', 6),
+                'trace_socket': (
+                    settings.trace_socket_tree, settings.trace_socket_node,
+                    settings.trace_socket_identifier, settings.trace_socket_is_output,
+                ) if getattr(settings, 'trace_socket_node', '') else None,
                 'enable_type_based_colors': getattr(settings, 'enable_type_based_colors', False),
                 'overall_opacity': getattr(settings, 'overall_opacity', 1.0),
+                'cache_static_layers': getattr(settings, 'cache_static_layers', False),
+                'merge_reroute_chains': getattr(settings, 'merge_reroute_chains', False),
+                'flow_style': getattr(settings, 'flow_style', 'GRADIENT'),
+                'particles_per_link': getattr(settings, 'particles_per_link', 4),
                 'backing_color': backing_color_rgba,
                 'gradient_colors': gradient_colors,
                 'field_gradient_colors': field_gradient_colors
@@ -1191,8 +1883,17 @@ def get_panel_settings():
                 'trace_mode': 'ALL_SELECTED',
                 'flow_direction': 'DOWNSTREAM',
                 'lock_flow': False,
+                'trace_through_groups': False,
+                'path_mode': 'SHORTEST',
+                'hop_fade': False,
+                'hop_fade_range': 6,
+                'trace_socket': None,
                 'enable_type_based_colors': False,
                 'overall_opacity': 1.0,
+                'cache_static_layers': False,
+                'merge_reroute_chains': False,
+                'flow_style': 'GRADIENT',
+                'particles_per_link': 4,
                 'backing_color': (0.0, 0.0, 0.0, 0.55),  # 默认值，格式：(R, G, B, A)
                 'gradient_colors': [
                     (0.0, 0.5, 1.0, 1.0),
@@ -1231,112 +1932,269 @@ def get_panel_settings():
             ]
         }
 
-def extend_links_through_reroutes(links_to_draw, start_node, direction='both', visited_nodes=None):
-    if visited_nodes is None:
-        visited_nodes = set()
-    if start_node in visited_nodes or start_node.type != 'REROUTE':
-        return
-    visited_nodes.add(start_node)
-    
-    if direction in ['forward', 'both']:
-        for output in start_node.outputs:
-            if output.enabled:
-                for link in output.links:
-                    links_to_draw.add(link)
-                    next_node = link.to_node
-                    if next_node and next_node.type == 'REROUTE':
-                        extend_links_through_reroutes(links_to_draw, next_node, 'forward', visited_nodes)
-    
-    if direction in ['backward', 'both']:
-        for input_socket in start_node.inputs:
-            if input_socket.enabled:
-                for link in input_socket.links:
-                    links_to_draw.add(link)
-                    prev_node = link.from_node
-                    if prev_node and prev_node.type == 'REROUTE':
-                        extend_links_through_reroutes(links_to_draw, prev_node, 'backward', visited_nodes)
-
-def trace_all_reroute_links(selected_node, links_to_draw, visited_nodes=None):
-    """旧模式：仅收集选定节点的直接连线 + Reroute 延伸"""
-    if visited_nodes is None:
-        visited_nodes = set()
-    if selected_node in visited_nodes:
-        return
-    visited_nodes.add(selected_node)
-    
-    for output in selected_node.outputs:
-        if output.enabled:
-            for link in output.links:
-                links_to_draw.add(link)
-                if link.to_node and link.to_node.type == 'REROUTE':
-                    extend_links_through_reroutes(links_to_draw, link.to_node, 'forward')
-    
-    for input_socket in selected_node.inputs:
-        if input_socket.enabled:
-            for link in input_socket.links:
-                links_to_draw.add(link)
-                if link.from_node and link.from_node.type == 'REROUTE':
-                    extend_links_through_reroutes(links_to_draw, link.from_node, 'backward')
-
-# --- 新的逻辑：真正的深度递归遍历 ---
-def traverse_recursive(current_node, direction, collected_links, visited_nodes):
+# --- 追踪结果与连线几何缓存（键为 change_tracker 版本号） ---
+# 按距离淡化时最远处连线的透明度系数
+HOP_FADE_MIN_ALPHA = 0.2
+# 两者都按区域指针保存（见 _get_region_entry）
+_trace_cache = {}
+_geometry_cache = {}
+
+def _new_trace_entry():
+    return {
+        'key': None,
+        'links': set(),
+        'nodes': set(),
+        'layout_nodes': (),
+        'units': None,
+        'hops': None,    # 连线 -> 距活动节点的层号（按距离淡化时）
+    }
+
+# 选择变化去抖：空闲后的第一次点击立即追踪；快速连续点击时，
+# 保留上一次的追踪结果，直到选择稳定 SELECTION_DEBOUNCE 秒后才重新追踪
+SELECTION_DEBOUNCE = 0.15
+_selection_debounce = {
+    'version': None,
+    'changed_at': 0.0,
+    'deferred': False,
+}
+
+def _should_defer_selection_trace(trace, trace_key):
+    """只有选择变化时判断是否推迟追踪，推迟时安排一次重绘以便稍后补上"""
+    cached_key = trace['key']
+    if cached_key is None or cached_key[:3] != trace_key[:3] or cached_key[4:] != trace_key[4:]:
+        return False
+    now = time.monotonic()
+    selection_version = trace_key[3]
+    if _selection_debounce['version'] != selection_version:
+        previous_change = _selection_debounce['changed_at']
+        _selection_debounce['version'] = selection_version
+        _selection_debounce['changed_at'] = now
+        _selection_debounce['deferred'] = now - previous_change < SELECTION_DEBOUNCE
+    if not _selection_debounce['deferred']:
+        return False
+    remaining = SELECTION_DEBOUNCE - (now - _selection_debounce['changed_at'])
+    if remaining <= 0.0:
+        _selection_debounce['deferred'] = False
+        return False
+    if not bpy.app.timers.is_registered(force_redraw):
+        bpy.app.timers.register(force_redraw, first_interval=remaining)
+    return True
+
+def free_draw_caches():
+    _trace_cache.clear()
+    _node_bounds_cache['key'] = None
+    _node_bounds_cache['ptrs'] = ()
+    _node_bounds_cache['bounds'] = None
+    flow_index.free_flow_index()
+    _selection_debounce['version'] = None
+    _selection_debounce['deferred'] = False
+    _geometry_cache.clear()
+
+def get_group_parent(space_data, edit_tree):
     """
-    深度优先搜索，遍历整个节点树的数据流
-    
-    direction: 'forward' (downstream) or 'backward' (upstream)
-    collected_links: 收集到的连线集合
-    visited_nodes: 已访问的节点集合（用于防止循环）
+    正在编辑节点组时返回 (父级节点树, 父级中对应的组节点)，否则返回 None
+    进入节点组时父级的活动节点就是该组节点；找不到时取第一个引用该节点组的组节点
     """
-    if current_node in visited_nodes:
-        return
-    visited_nodes.add(current_node)
-
-    if direction == 'forward':
-        # 向下查找：Output -> Links -> Next Node
-        for output in current_node.outputs:
-            if output.enabled:
-                for link in output.links:
-                    if link not in collected_links:
-                        collected_links.add(link)
-                        if link.to_node:
-                            traverse_recursive(link.to_node, 'forward', collected_links, visited_nodes)
-    
-    elif direction == 'backward':
-        # 向上查找：Input -> Links -> Previous Node
-        for input_socket in current_node.inputs:
-            if input_socket.enabled:
-                for link in input_socket.links:
-                    if link not in collected_links:
-                        collected_links.add(link)
-                        if link.from_node:
-                            traverse_recursive(link.from_node, 'backward', collected_links, visited_nodes)
+    path = getattr(space_data, 'path', None)
+    if path is None or len(path) < 2:
+        return None
+    parent_tree = path[len(path) - 2].node_tree
+    if parent_tree is None:
+        return None
+    active = parent_tree.nodes.active
+    if active is not None and active.type == 'GROUP' and active.node_tree == edit_tree:
+        return parent_tree, active
+    for node in parent_tree.nodes:
+        if node.type == 'GROUP' and node.node_tree == edit_tree:
+            return parent_tree, node
+    return None
 
-def draw_colorful_connections():
-    context = bpy.context
-    if context.space_data is None or context.space_data.type != 'NODE_EDITOR':
-        return
-    tree = context.space_data.node_tree
-    if not tree:
-        return
-    
-    settings = get_panel_settings()
-    if not settings.get('enable_colorful_connections', True):
-        return
+def collect_active_flow_links(tree, settings, active_node, group_parent=None, hops=None):
+    """
+    沿流向设置收集活动节点的数据流连线（绘制和“选中数据流节点”共用）
+    双向模式：上下游各自独立遍历，避免相互干扰
+    hops 不为 None 时记录每条连线距活动节点的层号
+    """
+    topology_version = change_tracker.get_version('topology')
+    index = flow_index.get_flow_index(tree, topology_version)
+    directions = _flow_walk_directions(settings)
+
+    links = set()
+    if not settings.get('trace_through_groups', False):
+        for walk_direction in directions:
+            links |= flow_index.collect_flow_links(index, (active_node,), walk_direction, hops)
+        return links
+
+    parent = None
+    if group_parent is not None:
+        parent_tree, group_node = group_parent
+        parent = (flow_index.get_flow_index(parent_tree, topology_version), group_node.as_pointer())
+    for walk_direction in directions:
+        links |= flow_index.collect_group_flow_links(index, (active_node,), walk_direction, topology_version, parent, hops)
+    return links
+
+def _flow_walk_directions(settings):
+    direction = settings.get('flow_direction', 'DOWNSTREAM')
+    directions = []
+    if direction in ('DOWNSTREAM', 'BOTH'):
+        directions.append('forward')
+    if direction in ('UPSTREAM', 'BOTH'):
+        directions.append('backward')
+    return directions
+
+def resolve_trace_socket(tree, settings):
+    """把拾取的接口（按节点名和接口标识符保存）解析为 (node, identifier, is_output)，不属于当前节点树时返回 None"""
+    picked = settings.get('trace_socket')
+    if not picked:
+        return None
+    tree_name, node_name, identifier, is_output = picked
+    if tree_name != tree.name:
+        return None
+    node = tree.nodes.get(node_name)
+    if node is None:
+        return None
+    sockets = node.outputs if is_output else node.inputs
+    if not any(socket.identifier == identifier for socket in sockets):
+        return None
+    return node, identifier, is_output
 
+def collect_socket_flow_links(tree, settings, node, identifier, is_output):
+    """
+    只追踪从单个接口可达的连线；静音节点的内部连线和节点组的流摘要提供接口到接口的依赖，
+    其他节点没有依赖信息，从任意输入进入都视为影响全部输出
+    """
+    topology_version = change_tracker.get_version('topology')
+    index = flow_index.get_flow_index(tree, topology_version)
+    links = set()
+    for walk_direction in _flow_walk_directions(settings):
+        links |= flow_index.collect_socket_flow_links(
+            index, node.as_pointer(), identifier, is_output, walk_direction, topology_version
+        )
+    return links
+
+SOCKET_PICK_RADIUS = 12.0  # 像素
+
+def find_socket_at(tree, region, mouse_x, mouse_y, radius=SOCKET_PICK_RADIUS):
+    """返回 Region 坐标附近最近的可见接口 (node, socket, is_output)，没有时返回 None"""
+    v2d = region.view2d
+    view_x, view_y = v2d.region_to_view(mouse_x, mouse_y)
+    limit = radius / _view2d_zoom_factor(v2d)
+    ui_scale = bpy.context.preferences.system.ui_scale
+    best = None
+    best_dist = limit * limit
+    for node in tree.nodes:
+        if node.type == 'FRAME':
+            continue
+        # 接口位于节点左右边缘，先用外扩的边界框排除远处的节点
+        x_min, x_max, y_a, y_b = node_bounds(node, ui_scale)
+        if (view_x < x_min - limit or view_x > x_max + limit
+                or view_y < min(y_a, y_b) - limit or view_y > max(y_a, y_b) + limit):
+            continue
+        for is_output, sockets in ((False, node.inputs), (True, node.outputs)):
+            for i, socket in enumerate(sockets):
+                if not socket.enabled or socket.hide:
+                    continue
+                x, y = get_socket_loc(node, is_output, i)
+                dist = (x - view_x) ** 2 + (y - view_y) ** 2
+                if dist <= best_dist:
+                    best = (node, socket, is_output)
+                    best_dist = dist
+    return best
+
+# --- 悬停追踪 ---
+_hover_state = {
+    'running': False,
+    'tree': 0,
+    'node': 0,
+}
+# 节点边界框（View2D 坐标），鼠标移动时向量化命中测试
+_node_bounds_cache = {
+    'key': None,
+    'ptrs': (),
+    'bounds': None,
+}
+
+def is_hover_trace_running():
+    return _hover_state['running']
+
+def start_hover_trace():
+    _hover_state['running'] = True
+
+def stop_hover_trace():
+    """停止悬停追踪（操作符结束或加载文件后操作符已被移除时）"""
+    _hover_state['running'] = False
+    set_hover_node(None, None)
+
+def set_hover_node(tree, node):
+    """记录鼠标下的节点，变化时递增 hover 版本号并返回 True"""
+    tree_ptr = tree.as_pointer() if tree is not None and node is not None else 0
+    node_ptr = node.as_pointer() if node is not None else 0
+    if (tree_ptr, node_ptr) == (_hover_state['tree'], _hover_state['node']):
+        return False
+    _hover_state['tree'] = tree_ptr
+    _hover_state['node'] = node_ptr
+    change_tracker.bump('hover')
+    return True
+
+def find_node_at(tree, region, mouse_x, mouse_y):
+    """返回 Region 坐标下最上层的节点（不含框架），没有时返回 None"""
+    # layout 版本只覆盖参与绘制的节点（且未绘制时不更新），这里对整棵树的节点取指纹
+    nodes = [node for node in tree.nodes if node.type != 'FRAME']
+    key = (tree.as_pointer(), change_tracker.get_version('ui_scale'), change_tracker.layout_fingerprint(nodes))
+    if _node_bounds_cache['key'] != key:
+        ui_scale = bpy.context.preferences.system.ui_scale
+        bounds = np.array([node_bounds(node, ui_scale) for node in nodes], dtype=np.float64).reshape(-1, 4)
+        # node_bounds 的 y 顺序随节点是否折叠而不同，这里统一为 (x_min, x_max, y_min, y_max)
+        bounds[:, 2:] = np.sort(bounds[:, 2:], axis=1)
+        _node_bounds_cache['key'] = key
+        _node_bounds_cache['ptrs'] = tuple(node.as_pointer() for node in nodes)
+        _node_bounds_cache['bounds'] = bounds
+    bounds = _node_bounds_cache['bounds']
+    if not len(bounds):
+        return None
+    view_x, view_y = region.view2d.region_to_view(mouse_x, mouse_y)
+    hits = np.nonzero(
+        (bounds[:, 0] <= view_x) & (view_x <= bounds[:, 1])
+        & (bounds[:, 2] <= view_y) & (view_y <= bounds[:, 3])
+    )[0]
+    if not len(hits):
+        return None
+    # 节点按绘制顺序排列，后面的在上层
+    hit_ptr = _node_bounds_cache['ptrs'][hits[-1]]
+    index = flow_index.get_flow_index(tree, change_tracker.get_version('topology'))
+    return index['nodes'].get(hit_ptr)
+
+def collect_path_links(tree, settings, from_node, to_node):
+    """from 到 to 的路径上的连线：一条最短路径（双向广度优先），或所有路径（可达性位集求交）"""
+    index = flow_index.get_flow_index(tree, change_tracker.get_version('topology'))
+    from_ptr = from_node.as_pointer()
+    to_ptr = to_node.as_pointer()
+    if settings.get('path_mode', 'SHORTEST') == 'ALL':
+        return set(reachability.collect_path_links(reachability.get_reachability(index), from_ptr, to_ptr))
+    return set(flow_index.shortest_path_links(index, from_ptr, to_ptr) or ())
+
+def _trace_links(tree, settings, selected_nodes, active_node, group_parent=None):
+    """
+    按追踪模式收集要绘制的连线和要画边框的节点
+    使用按拓扑版本缓存的邻接索引做多源遍历，不再逐节点访问 socket.links
+    group_parent: 正在编辑节点组时的 (父级节点树, 组节点)，用于跨节点组追踪
+    返回 (连线集合, 边框节点集合, 连线层号)；只有活动节点流开启按距离淡化时才有层号，否则为 None
+    """
+    index = flow_index.get_flow_index(tree, change_tracker.get_version('topology'))
     links_to_draw = set()
     nodes_to_outline = set()  # 用来画边框的节点
+    hops = None
 
     trace_mode = settings.get('trace_mode', 'ALL_SELECTED')
 
     # --- 逻辑分支 ---
     if trace_mode == 'ALL_SELECTED':
         # 原有逻辑：所有选中节点都发光
-        selected_nodes = context.selected_nodes
         if not selected_nodes:
-            return
+            return links_to_draw, nodes_to_outline, hops
         nodes_to_outline = set(selected_nodes)  # 边框只画选中的
-        for node in selected_nodes:
-            trace_all_reroute_links(node, links_to_draw)
+        # 所有选中节点一起作为起点，共享访问集合
+        links_to_draw = flow_index.collect_direct_links(index, selected_nodes)
             
     elif trace_mode == 'ACTIVE_FLOW':
         # 新逻辑：仅追踪活动节点的数据流
@@ -1347,74 +2205,112 @@ def draw_colorful_connections():
             _locked_flow_data['is_locked'] = False
             _locked_flow_data['links'].clear()
             _locked_flow_data['nodes'].clear()
+            _locked_flow_data['hops'] = None
         
         # 检查是否需要使用固定的流
         if lock_flow and _locked_flow_data['is_locked']:
             # 使用固定的流数据
             links_to_draw.update(_locked_flow_data['links'])
             nodes_to_outline.update(_locked_flow_data['nodes'])
+            hops = _locked_flow_data['hops']
         else:
             # 重新计算流
-            active_node = context.active_node
             if not active_node:
-                return
+                return links_to_draw, nodes_to_outline, hops
             
             # 边框始终画活动节点
             nodes_to_outline.add(active_node)
             
-            direction = settings.get('flow_direction', 'DOWNSTREAM')
-            
-            if direction == 'BOTH':
-                # 双向模式：使用两个独立的 visited_nodes 集合，避免相互干扰
-                visited_nodes_forward = set()
-                visited_nodes_backward = set()
-                
-                # 向下遍历
-                traverse_recursive(active_node, 'forward', links_to_draw, visited_nodes_forward)
-                # 向上遍历
-                traverse_recursive(active_node, 'backward', links_to_draw, visited_nodes_backward)
-            else:
-                # 单向模式：使用一个集合即可
-                visited_nodes_trace = set()
-                if direction == 'DOWNSTREAM':
-                    traverse_recursive(active_node, 'forward', links_to_draw, visited_nodes_trace)
-                elif direction == 'UPSTREAM':
-                    traverse_recursive(active_node, 'backward', links_to_draw, visited_nodes_trace)
+            # 按距离淡化：层号在同一次遍历中记录
+            hops = {} if settings.get('hop_fade', False) else None
+            links_to_draw |= collect_active_flow_links(tree, settings, active_node, group_parent, hops)
             
             # 如果启用了锁定，保存当前的流状态
             if lock_flow:
                 _locked_flow_data['links'] = links_to_draw.copy()
                 _locked_flow_data['nodes'] = nodes_to_outline.copy()
+                _locked_flow_data['hops'] = hops
                 _locked_flow_data['is_locked'] = True
 
-    if not links_to_draw and not nodes_to_outline:
-        return
-
-    gpu.state.blend_set('ALPHA')
-
-    v2d = context.region.view2d
+    elif trace_mode == 'HOVER':
+        # 鼠标下节点的数据流：查询预计算的可达性位集，不改变选择和活动节点
+        if _hover_state['tree'] != tree.as_pointer():
+            return links_to_draw, nodes_to_outline, hops
+        node_ptr = _hover_state['node']
+        index = flow_index.get_flow_index(tree, change_tracker.get_version('topology'))
+        node = index['nodes'].get(node_ptr)
+        if node is None:
+            return links_to_draw, nodes_to_outline, hops
+        nodes_to_outline.add(node)
+        reach = reachability.get_reachability(index)
+        for walk_direction in _flow_walk_directions(settings):
+            links_to_draw |= reachability.collect_reachable_links(reach, node_ptr, walk_direction)
+
+    elif trace_mode == 'PATH':
+        # 选中两个节点时只显示它们之间的路径（活动节点优先作为起点，不可达时反向）
+        if not selected_nodes or len(selected_nodes) != 2:
+            return links_to_draw, nodes_to_outline, hops
+        first, second = selected_nodes
+        if second == active_node:
+            first, second = second, first
+        nodes_to_outline = {first, second}
+        links_to_draw = collect_path_links(tree, settings, first, second)
+        if not links_to_draw:
+            links_to_draw = collect_path_links(tree, settings, second, first)
+
+    elif trace_mode == 'ACTIVE_SOCKET':
+        # 只追踪拾取的接口，巨型节点上只点亮一小部分连线
+        picked = resolve_trace_socket(tree, settings)
+        if picked is None:
+            return links_to_draw, nodes_to_outline, hops
+        node, identifier, is_output = picked
+        nodes_to_outline.add(node)
+        links_to_draw = collect_socket_flow_links(tree, settings, node, identifier, is_output)
+
+    return links_to_draw, nodes_to_outline, hops
+
+def _ui_scale_fingerprint():
+    system = bpy.context.preferences.system
+    return (system.dpi, system.pixel_size)
+
+def _get_unit_points(units_links, v2d, curv_factor, zoom):
+    """
+    计算一个绘制单元（单条连线或合并的 Reroute 链）的折线和每段连线的控制点
+    链中各段首尾相接，拼接时去掉重复的连接点，进度沿整条链的弧长连续
+    """
+    pts = []
+    ctrls = []
+    for link in units_links:
+        ctrl = get_link_control_points(link, curv_factor)
+        if ctrl is None:
+            return None, None
+        seg = tessellate_link_points(ctrl, v2d, zoom)
+        if not seg or len(seg) < 2:
+            return None, None
+        pts.extend(seg[1:] if pts else seg)
+        ctrls.append(ctrl)
+    return pts, ctrls
+
+def _build_link_geometry(tree, region, settings, links_to_draw, nodes_to_outline, curv_factor, units=None, hops=None):
+    """
+    计算节点边框和连线的屏幕空间几何（只在几何缓存键变化时调用）
+    units 为绘制单元（有序连线元组）列表；为 None 时每条连线单独绘制
+    hops 为追踪时记录的连线层号，没有记录的连线层号为 0
+    """
+    v2d = region.view2d
     zoom = _view2d_zoom_factor(v2d)
-    
-    time_sec = time.time() * settings.get('animation_speed', 1.0)
-    connection_color_type = settings.get('connection_color_type', 'CUSTOM')
-    overall_opacity = settings.get('overall_opacity', 1.0)
-    
-    grad_cols = settings.get('gradient_colors', [])
-    field_grad_cols = settings.get('field_gradient_colors', [])
-
-    batch_lines_backing = []
-    batch_lines_main = []
     batch_node_bbox = []
-
-    batch_circles_backing = []
-    batch_circles_start = []
-    batch_circles_end = []
+    bbox_width = 1.0
 
     # 处理节点边框
     if nodes_to_outline:
         border_thickness = settings.get('node_border_thickness', 3.0)
         bbox_width = max(1.0, border_thickness * zoom)
         pixel_radius = 4.0 * zoom
+        # 跳过与区域（外扩线宽）不相交的边框：所有边框在同一个批次中，
+        # 批次的像素范围越大，int16 定点坐标的步长越大，放大后边框会抖动
+        margin = bbox_width + 2.0
+        view_rect = (-margin, -margin, region.width + margin, region.height + margin)
         
         for node in nodes_to_outline:
             bbox_poly = get_rounded_rect_path(
@@ -1423,59 +2319,63 @@ def draw_colorful_connections():
                 radius=pixel_radius,
                 thickness=bbox_width
             )
-            if bbox_poly:
+            if bbox_poly and _path_intersects_rect(bbox_poly, view_rect):
                 batch_node_bbox.append(bbox_poly)
 
     socket_index_cache = {}
-    curv_factor = get_curving_factor()
-    enable_type_colors = settings.get('enable_type_based_colors', False)
+    
+    width_backing = max(2.0, 9.0 * zoom)
+    width_main = max(1.5, settings.get('line_thickness', 2.0) * zoom)
+    
+    # 裁剪矩形：区域范围外扩最宽线条的一半，超出部分不生成顶点
+    clip_margin = max(width_backing, width_main) * 0.5 + 2.0
+    clip_rect = (-clip_margin, -clip_margin, region.width + clip_margin, region.height + clip_margin)
     
     # 存储每条连线的信息，用于后续绘制
     link_info_list = []
 
-    for link in links_to_draw:
-        fs = getattr(link, "from_socket", None)
-        ts = getattr(link, "to_socket", None)
+    if units is None:
+        units = [(link,) for link in links_to_draw]
+
+    for unit in units:
+        first_link = unit[0]
+        last_link = unit[-1]
+        fs = getattr(first_link, "from_socket", None)
+        ts = getattr(last_link, "to_socket", None)
         if not fs or not ts:
             continue
-        n1 = link.from_node
-        n2 = link.to_node
-        from_idx = _get_socket_index_cached(socket_index_cache, n1, fs, True)
-        to_idx = _get_socket_index_cached(socket_index_cache, n2, ts, False)
-        if from_idx is None or to_idx is None:
-            continue
-        # 计算位置
-        try:
-            # get_socket_loc 可能在特殊情况下失败，加个保护
-            l1x, l1y = get_socket_loc(n1, True, from_idx)
-            l2x, l2y = get_socket_loc(n2, False, to_idx)
-        except:
-            continue
+        if len(unit) == 1:
+            from_idx = _get_socket_index_cached(socket_index_cache, first_link.from_node, fs, True)
+            to_idx = _get_socket_index_cached(socket_index_cache, last_link.to_node, ts, False)
+            if from_idx is None or to_idx is None:
+                continue
 
-        # 性能优化：根据缩放级别调整采样点数
-        pts = get_native_link_points(link, v2d, curv_factor, zoom)
+        # 性能优化：根据屏幕上的长度和弯曲程度调整采样点数
+        pts, ctrls = _get_unit_points(unit, v2d, curv_factor, zoom)
         if not pts or len(pts) < 2:
             continue
         
         # 性能优化：视口裁剪，跳过不可见的连线
-        try:
-            region = context.region
-            if not _is_link_visible(region, pts, margin=100):
-                continue
-        except:
-            # 如果无法获取 region，继续绘制（向后兼容）
-            pass
+        if not _is_link_visible(region, pts, margin=100):
+            continue
+        
+        # 长连线只保留与视口相交的子段（保持整条连线的弧长进度）
+        runs = clip_polyline_to_rect(pts, clip_rect)
         
-        # 保存连线信息和socket信息
-        is_field = is_field_link(tree, link)
+        # 保存连线信息和socket信息（合并的链以最后一段的目标接口判断类型）
+        is_field = is_field_link(tree, last_link)
         link_info_list.append({
             'pts': pts,
+            'ctrl': ctrls[0],
+            'ctrls': ctrls,
+            'runs': runs,
             'from_socket': fs,
             'to_socket': ts,
             'start_pos': (pts[0][0], pts[0][1]),
             'end_pos': (pts[-1][0], pts[-1][1]),
             'is_field': is_field,
-            'link': link  # 保存link引用以便后续使用
+            'hop': hops.get(first_link, 0) if hops else 0,
+            'link': last_link  # 保存link引用以便后续使用
         })
 
     # 分离Field和Constant连线
@@ -1487,157 +2387,150 @@ def draw_colorful_connections():
             field_links.append(link_info)
         else:
             constant_links.append(link_info)
+
+    return {
+        'zoom': zoom,
+        'width_backing': width_backing,
+        'width_main': width_main,
+        'bbox_width': bbox_width,
+        'batch_node_bbox': batch_node_bbox,
+        'link_info_list': link_info_list,
+        'field_links': field_links,
+        'constant_links': constant_links,
+    }
+
+def draw_colorful_connections():
+    context = bpy.context
+    if context.space_data is None or context.space_data.type != 'NODE_EDITOR':
+        return
+    tree = context.space_data.node_tree
+    if not tree:
+        return
     
-    width_backing = max(2.0, 9.0 * zoom)
-    width_main = max(1.5, settings.get('line_thickness', 2.0) * zoom)
+    # 配置（颜色/预设）延迟到第一次绘制时再加载
+    if _config_sync_callback is not None:
+        _config_sync_callback(context.scene)
+    
+    settings = get_panel_settings()
+    if not settings.get('enable_colorful_connections', True):
+        return
 
-    # 1. Backing (底层背景) - 给所有连线画背景
-    all_backing = [info['pts'] for info in link_info_list]
-    if all_backing:
-        # 从设置中获取底层背景颜色（draw_batch_lines会自动应用overall_opacity）
-        backing_color_setting = settings.get('backing_color', (0.0, 0.0, 0.0, 0.55))
-        # 确保是RGBA格式的tuple，并确保所有值都是float
-        if isinstance(backing_color_setting, (list, tuple)) and len(backing_color_setting) >= 4:
-            backing_color = (
-                float(backing_color_setting[0]),
-                float(backing_color_setting[1]),
-                float(backing_color_setting[2]),
-                float(backing_color_setting[3])
-            )
-        else:
-            backing_color = (0.0, 0.0, 0.0, 0.55)
-        
-        # 调试：打印颜色值（可以注释掉）
-        # print(f"底层背景颜色: {backing_color}, 整体透明度: {overall_opacity}")
-        
-        draw_batch_lines(all_backing, 'SMOOTH_COLOR', width_backing, colors=[backing_color], overall_opacity=overall_opacity)
-
-    # 2. Main Lines - Constant连线：实线流动
-    if constant_links:
-        if enable_type_colors:
-            # 性能优化：按socket类型分组，批量绘制相同类型的连线
-            links_by_socket_type = {}
-            for link_info in constant_links:
-                ts = link_info['to_socket']
-                socket_type = get_socket_type_name(ts)
-                if socket_type not in links_by_socket_type:
-                    links_by_socket_type[socket_type] = []
-                links_by_socket_type[socket_type].append(link_info)
-            
-            # 为每种socket类型批量绘制
-            for socket_type, type_links in links_by_socket_type.items():
-                if not type_links:
-                    continue
-                # 获取该类型的颜色偏移
-                sample_link = type_links[0]
-                ts = sample_link['to_socket']
-                link_colors = apply_type_based_color_shift(grad_cols, sample_link['from_socket'], ts, offset_strength=0.5)
-                # 批量绘制所有相同类型的连线
-                type_points = [info['pts'] for info in type_links]
-                draw_batch_lines(type_points, 'GRADIENT', width_main, colors=link_colors, time_sec=time_sec, overall_opacity=overall_opacity)
-        else:
-            # 所有连线使用相同颜色
-            constant_main = [info['pts'] for info in constant_links]
-            draw_batch_lines(constant_main, 'GRADIENT', width_main, colors=grad_cols, time_sec=time_sec, overall_opacity=overall_opacity)
-    
-    # 3. Field连线：使用Field配色方案（实线，不再使用虚线）
-    if field_links:
-        if enable_type_colors:
-            # 性能优化：按socket类型分组，批量绘制相同类型的连线
-            field_links_by_socket_type = {}
-            for field_info in field_links:
-                ts = field_info['to_socket']
-                socket_type = get_socket_type_name(ts)
-                if socket_type not in field_links_by_socket_type:
-                    field_links_by_socket_type[socket_type] = []
-                field_links_by_socket_type[socket_type].append(field_info)
-            
-            # 为每种socket类型批量绘制
-            for socket_type, type_links in field_links_by_socket_type.items():
-                if not type_links:
-                    continue
-                # 获取该类型的颜色偏移
-                sample_link = type_links[0]
-                ts = sample_link['to_socket']
-                link_colors = apply_type_based_color_shift(field_grad_cols, sample_link['from_socket'], ts, offset_strength=0.5)
-                # 批量绘制所有相同类型的连线
-                type_points = [info['pts'] for info in type_links]
-                draw_batch_lines(type_points, 'GRADIENT', width_main, colors=link_colors, time_sec=time_sec, overall_opacity=overall_opacity)
-        else:
-            # 所有Field连线使用Field配色方案
-            field_main = [info['pts'] for info in field_links]
-            draw_batch_lines(field_main, 'GRADIENT', width_main, colors=field_grad_cols, time_sec=time_sec, overall_opacity=overall_opacity)
+    # --- 变化追踪：输入不变时复用追踪结果、连线几何和GPU批次 ---
+    # 选择只通过廉价指纹检测；只有选择/活动节点变化（并经过去抖）时才重新追踪
+    # 进入节点组后，选中的节点和要追踪的连线都属于正在编辑的节点组
+    edit_tree = getattr(context.space_data, 'edit_tree', None) or tree
+    tree_ptr = edit_tree.as_pointer()
+    change_tracker.observe_tree(edit_tree)
+    change_tracker.observe('settings', None, repr(settings))
+    selected_nodes = context.selected_nodes
+    active_node = context.active_node
+    change_tracker.observe_selection(edit_tree, selected_nodes, active_node)
+    
+    region = context.region
+    region_key = region.as_pointer()
+    trace = _get_region_entry(_trace_cache, region_key, _new_trace_entry)
+    trace_key = (tree_ptr, _locked_flow_data['is_locked']) + change_tracker.get_versions('topology', 'selection', 'settings', 'hover')
+    if trace['key'] != trace_key and not _should_defer_selection_trace(trace, trace_key):
+        _selection_debounce['version'] = trace_key[3]
+        group_parent = get_group_parent(context.space_data, edit_tree) if edit_tree != tree else None
+        links_to_draw, nodes_to_outline, hops = _trace_links(edit_tree, settings, selected_nodes, active_node, group_parent)
+        # 参与绘制的节点：布局变化只需要关注这些节点
+        layout_nodes = set(nodes_to_outline)
+        for link in links_to_draw:
+            layout_nodes.add(link.from_node)
+            layout_nodes.add(link.to_node)
+        trace['key'] = (tree_ptr, _locked_flow_data['is_locked']) + change_tracker.get_versions('topology', 'selection', 'settings', 'hover')
+        trace['links'] = links_to_draw
+        trace['nodes'] = nodes_to_outline
+        trace['hops'] = hops
+        trace['layout_nodes'] = tuple(layout_nodes)
+        # 可选：Reroute 链合并为一条连续折线（连续的渐变相位，中间没有端点圆圈）
+        trace['units'] = None
+        if settings.get('merge_reroute_chains', False):
+            index = flow_index.get_flow_index(edit_tree, change_tracker.get_version('topology'))
+            trace['units'] = flow_index.group_chain_units(index, links_to_draw)
+    links_to_draw = trace['links']
+    nodes_to_outline = trace['nodes']
 
-    # 3. Circles - 背景圆圈（给所有连线）
-    all_circles_backing = []
-    for info in link_info_list:
-        all_circles_backing.append(info['start_pos'])
-        all_circles_backing.append(info['end_pos'])
-    if all_circles_backing:
-        backing_circle_color = (0, 0, 0, 0.55 * overall_opacity)
-        draw_batch_circles(all_circles_backing, 7.0 * zoom, backing_circle_color, overall_opacity=overall_opacity)
+    if not links_to_draw and not nodes_to_outline:
+        return
 
-    # 端点圆圈 - 根据连线类型（Constant或Field）显示不同颜色
-    if enable_type_colors:
-        # 性能优化：按颜色和大小分组，批量绘制端点圆圈
-        circles_by_key = {}  # key: (color_tuple, size) -> list of positions
-        for link_info in link_info_list:
-            ts = link_info['to_socket']
-            sx, sy = link_info['start_pos']
-            tx, ty = link_info['end_pos']
-            is_field = link_info.get('is_field', False)
-            
-            # 根据连线类型选择颜色方案
-            base_cols = field_grad_cols if is_field else grad_cols
-            
-            # 起始端点
-            socket_color_start = apply_type_based_color_shift([base_cols[0] if base_cols else (1,1,1,1)], None, ts, offset_strength=0.5)[0]
-            socket_size_start = get_socket_circle_size(ts, zoom)
-            start_key = (socket_color_start, socket_size_start)
-            if start_key not in circles_by_key:
-                circles_by_key[start_key] = []
-            circles_by_key[start_key].append((sx, sy))
-            
-            # 结束端点
-            socket_color_end = apply_type_based_color_shift([base_cols[-1] if base_cols else (1,1,1,1)], None, ts, offset_strength=0.5)[0]
-            socket_size_end = get_socket_circle_size(ts, zoom)
-            end_key = (socket_color_end, socket_size_end)
-            if end_key not in circles_by_key:
-                circles_by_key[end_key] = []
-            circles_by_key[end_key].append((tx, ty))
-        
-        # 批量绘制所有相同颜色和大小的圆圈
-        for (color, size), positions in circles_by_key.items():
-            if positions:
-                draw_batch_circles(positions, size, color, overall_opacity=overall_opacity)
+    gpu.state.blend_set('ALPHA')
+
+    curv_factor = get_curving_factor()
+    change_tracker.observe_layout(edit_tree, trace['layout_nodes'])
+    change_tracker.observe_view2d(region)
+    change_tracker.observe('curving', None, curv_factor)
+    change_tracker.observe('ui_scale', None, _ui_scale_fingerprint())
+    settings_version = change_tracker.get_version('settings')
+    geometry_key = trace['key'] + (region_key,) + change_tracker.get_versions('layout', 'view2d', 'curving', 'ui_scale')
+    begin_batch_cache(region_key, geometry_key)
+    
+    time_sec = time.time() * settings.get('animation_speed', 1.0)
+    connection_color_type = settings.get('connection_color_type', 'CUSTOM')
+    overall_opacity = settings.get('overall_opacity', 1.0)
+    
+    grad_cols = settings.get('gradient_colors', [])
+    field_grad_cols = settings.get('field_gradient_colors', [])
+    ensure_palette_texture(grad_cols, field_grad_cols, version=settings_version)
+    enable_type_colors = settings.get('enable_type_based_colors', False)
+    
+    geometry_cache = _get_region_entry(_geometry_cache, region_key, lambda: {'key': None, 'data': None})
+    if geometry_cache['key'] == geometry_key:
+        geometry = geometry_cache['data']
     else:
-        # 根据连线类型使用不同的颜色方案
-        constant_start_positions = [info['start_pos'] for info in constant_links]
-        constant_end_positions = [info['end_pos'] for info in constant_links]
-        field_start_positions = [info['start_pos'] for info in field_links]
-        field_end_positions = [info['end_pos'] for info in field_links]
-        
-        # Constant连线端点
-        if constant_start_positions or constant_end_positions:
-            c_start = grad_cols[0] if grad_cols else (1,1,1,1)
-            c_end = grad_cols[-1] if grad_cols else c_start
-            if constant_start_positions:
-                draw_batch_circles(constant_start_positions, 5.0 * zoom, c_start, overall_opacity=overall_opacity)
-            if constant_end_positions:
-                draw_batch_circles(constant_end_positions, 5.0 * zoom, c_end, overall_opacity=overall_opacity)
-        
-        # Field连线端点
-        if field_start_positions or field_end_positions:
-            f_start = field_grad_cols[0] if field_grad_cols else (0.8, 0.2, 1.0, 1.0)
-            f_end = field_grad_cols[-1] if field_grad_cols else f_start
-            if field_start_positions:
-                draw_batch_circles(field_start_positions, 5.0 * zoom, f_start, overall_opacity=overall_opacity)
-            if field_end_positions:
-                draw_batch_circles(field_end_positions, 5.0 * zoom, f_end, overall_opacity=overall_opacity)
+        geometry = _build_link_geometry(tree, region, settings, links_to_draw, nodes_to_outline, curv_factor, trace['units'], trace['hops'])
+        geometry_cache['key'] = geometry_key
+        geometry_cache['data'] = geometry
+    zoom = geometry['zoom']
+    width_backing = geometry['width_backing']
+    width_main = geometry['width_main']
+    bbox_width = geometry['bbox_width']
+    batch_node_bbox = geometry['batch_node_bbox']
+    link_info_list = geometry['link_info_list']
+    field_links = geometry['field_links']
+    constant_links = geometry['constant_links']
+
+    backing_color = settings.get('backing_color', (0.0, 0.0, 0.0, 0.55))
+    main_links = constant_links + field_links
+    
+    # 按距离淡化：主线、底层背景和端点圆圈使用相同的淡化系数
+    hop_fade = None
+    if trace['hops'] is not None:
+        hop_fade = (settings.get('hop_fade_range', 6), HOP_FADE_MIN_ALPHA)
+    
+    def draw_static_layers():
+        _draw_backing_lines(link_info_list, backing_color, width_backing, overall_opacity, hop_fade)
+        _draw_endpoint_circles(link_info_list, grad_cols, field_grad_cols, enable_type_colors, zoom, overall_opacity, settings_version, hop_fade)
+    
+    # 静态层（底层背景、背景圆圈、端点圆圈）不随动画变化：开启缓存时渲染到离屏纹理，只在输入变化时重绘
+    # 几何缓存键已包含区域、视图、布局和设置的版本号
+    static_key = None
+    if settings.get('cache_static_layers', False):
+        static_key = geometry_key
+    elif _static_layer_cache:
+        free_static_layer_cache()
+    
+    def draw_animated_layer():
+        if settings.get('flow_style', 'GRADIENT') == 'PARTICLES':
+            particles_per_link = settings.get('particles_per_link', 4)
+            units = trace['units'] or [(link,) for link in links_to_draw]
+            particle_key = trace['key'] + change_tracker.get_versions('layout', 'curving', 'ui_scale')
+            _draw_flow_particles(tree, units, enable_type_colors, curv_factor, region, max(2.0, width_main), particles_per_link, time_sec, overall_opacity, particle_key)
+        else:
+            _draw_main_lines(main_links, enable_type_colors, width_main, time_sec, overall_opacity, hop_fade)
+    
+    if static_key is not None and draw_cached_static_layer(region, static_key, draw_static_layers):
+        gpu.state.blend_set('ALPHA')
+        draw_animated_layer()
+    else:
+        _draw_backing_lines(link_info_list, backing_color, width_backing, overall_opacity, hop_fade)
+        draw_animated_layer()
+        _draw_endpoint_circles(link_info_list, grad_cols, field_grad_cols, enable_type_colors, zoom, overall_opacity, settings_version, hop_fade)
 
     # 4. Node Borders
     if batch_node_bbox:
-        draw_batch_lines(batch_node_bbox, 'GRADIENT', bbox_width, colors=grad_cols, time_sec=time_sec, overall_opacity=overall_opacity)
+        draw_batch_lines(batch_node_bbox, 'GRADIENT', bbox_width, time_sec=time_sec, overall_opacity=overall_opacity, cache_slot='borders')
 
     gpu.state.blend_set('NONE')
     # 性能优化：根据连线数量动态调整重绘频率
@@ -1664,18 +2557,86 @@ def force_redraw():
         pass
     return None
 
+# --- 性能统计 ---
+# 记录各阶段最近一次耗时（毫秒），并在控制台输出
+_PROFILE_STATS = {}
+
+def report_timing(label, start_time):
+    """记录并输出从 start_time（time.perf_counter()）到现在的耗时"""
+    elapsed_ms = (time.perf_counter() - start_time) * 1000.0
+    _PROFILE_STATS[label] = elapsed_ms
+    print(f"[彩色连线] {label}: {elapsed_ms:.2f} ms")
+    return elapsed_ms
+
+# --- 延迟加载配置 ---
+# 由 panels 注册：绘制连线前检查配置是否已加载（回调本身只读，实际加载在定时器中进行）
+_config_sync_callback = None
+
+def set_config_sync_callback(callback):
+    global _config_sync_callback
+    _config_sync_callback = callback
+
+# --- 着色器预热 ---
+# 注册后通过延迟定时器编译全部着色器并创建常用的索引缓冲，
+# 避免第一次选中节点时在绘制回调里卡顿
+WARMUP_SHADER_NAMES = ('RAINBOW', 'GRADIENT', 'SMOOTH_COLOR', 'SDF_CIRCLE', 'FLOW_PARTICLE')
+WARMUP_DELAY = 0.1
+# 常见的端点圆数量（单条连线两个端点起）
+WARMUP_QUAD_COUNTS = (1, 2, 4, 8)
+
+def warm_up_gpu_resources():
+    """编译所有着色器变体并预先创建顶点格式和索引缓冲（定时器回调，只执行一次）"""
+    if bpy.app.background:
+        return None
+    start_time = time.perf_counter()
+    try:
+        for name in WARMUP_SHADER_NAMES:
+            get_shader(name)
+        _get_line_vert_format(False)
+        _get_line_vert_format(True)
+        _get_particle_vert_format()
+        for segments in LINK_SEGMENT_BUCKETS:
+            _get_strip_index_buffer(segments + 1, 1)
+        for quad_count in WARMUP_QUAD_COUNTS:
+            _get_quad_index_buffer(quad_count)
+    except Exception as e:
+        print(f"[彩色连线] 着色器预热失败: {e}")
+        return None
+    report_timing("着色器预热", start_time)
+    return None
+
+def free_gpu_caches():
+    """释放绘制流程中缓存的GPU资源（索引缓冲、调色板纹理、离屏缓冲、粒子批次）"""
+    _STRIP_INDEX_CACHE.clear()
+    _QUAD_INDEX_CACHE.clear()
+    _palette_state['texture'] = None
+    _palette_state['key'] = None
+    free_static_layer_cache()
+    _particle_batch_cache.clear()
+    _batch_cache.clear()
+    _active_batch_cache['batches'] = None
+    free_draw_caches()
+
 def register():
     global draw_handler, _SHADER_CACHE
     # 清除着色器缓存，确保使用最新的着色器代码（包括alpha支持）
     _SHADER_CACHE.clear()
+    free_gpu_caches()
+    change_tracker.register()
     draw_handler = bpy.types.SpaceNodeEditor.draw_handler_add(
         draw_colorful_connections, (), 'WINDOW', 'POST_PIXEL'
     )
+    if not bpy.app.background and not bpy.app.timers.is_registered(warm_up_gpu_resources):
+        bpy.app.timers.register(warm_up_gpu_resources, first_interval=WARMUP_DELAY)
 
 def unregister():
     global draw_handler, _SHADER_CACHE
     if draw_handler:
         bpy.types.SpaceNodeEditor.draw_handler_remove(draw_handler, 'WINDOW')
         draw_handler = None
+    change_tracker.unregister()
+    if bpy.app.timers.is_registered(warm_up_gpu_resources):
+        bpy.app.timers.unregister(warm_up_gpu_resources)
     # 清除着色器缓存
-    _SHADER_CACHE.clear()
\ No newline at end of file
+    _SHADER_CACHE.clear()
+    free_gpu_caches()
\ No newline at end of file